@@ -0,0 +1,61 @@
+import pygame
+
+
+class Assets:
+    """Process-wide cache of images, sounds and fonts
+
+    Every asset is loaded once and the same object is handed to every game
+    instance. Images are converted to the display pixel format as soon as a
+    display exists. The mixer and font subsystems are initialized on the
+    first sound or font request.
+    """
+
+    def __init__(self):
+        self.images = {}
+        self.converted = set()
+        self.sounds = {}
+        self.fonts = {}
+
+    def image(self, filename):
+        image = self.images.get(filename)
+        if image is None:
+            image = self.images[filename] = pygame.image.load(filename)
+        if filename not in self.converted and pygame.display.get_surface() is not None:
+            image = self.images[filename] = image.convert()
+            self.converted.add(filename)
+        return image
+
+    def sound(self, filename):
+        sound = self.sounds.get(filename)
+        if sound is None:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(44100, 16, 2, 4096)
+            sound = self.sounds[filename] = pygame.mixer.Sound(filename)
+        return sound
+
+    def font(self, font_name, font_size):
+        key = (font_name, font_size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[key] = pygame.font.SysFont(font_name, font_size)
+        return font
+
+    def memory(self):
+        """Return bytes used by each loaded image and sound, keyed by filename
+
+        Fonts are not included, pygame does not expose their size.
+        """
+        usage = {filename: image.get_pitch() * image.get_height() for filename, image in self.images.items()}
+        usage.update((filename, len(sound.get_raw())) for filename, sound in self.sounds.items())
+        return usage
+
+    def clear(self):
+        self.images.clear()
+        self.converted.clear()
+        self.sounds.clear()
+        self.fonts.clear()
+
+
+assets = Assets()
@@ -0,0 +1,250 @@
+"""
+Performance benchmarks for the simulation, collisions, rendering and envs.
+
+Usage: python benchmark.py [--duration SECONDS] [--output FILE]
+
+Results are printed and written as JSON so runs on different commits can be
+compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import config as c
+from bot.main import get_action
+
+
+def rate(func, duration):
+    """Call func until duration has passed and return calls per second"""
+    calls = 0
+    start = time.perf_counter()
+    end = start + duration
+    while True:
+        func()
+        calls += 1
+        if calls % 100 == 0 and time.perf_counter() >= end:
+            break
+    return calls / (time.perf_counter() - start)
+
+
+def bench_simulation(duration):
+    from simulation import Simulation
+
+    state = {'sim': Simulation(seed=0), 'episodes': 0}
+
+    def step():
+        sim = state['sim']
+        if sim.game_over or sim.ticks >= 20000:
+            state['episodes'] += 1
+            sim = state['sim'] = Simulation(seed=state['episodes'])
+        ball = sim.ball.bounds
+        sim.step(get_action(sim.paddle.bounds.x + c.paddle_width // 2, ball.x, ball.y + c.ball_radius,
+                            sim.ball.speed))
+
+    return {'steps_per_sec': rate(step, duration)}
+
+
+def bench_snapshot(duration):
+    from simulation import Simulation
+
+    sim = Simulation(seed=0)
+    for _ in range(1000):
+        sim.step(1 if sim.paddle.bounds.centerx < sim.ball.bounds.x else 0)
+    state = bytes(sim.clone_state())
+    out = bytearray(sim.state_size())
+    return {'state_bytes': len(state),
+            'clone_us': 1e6 / rate(lambda: sim.clone_state(out), duration / 3),
+            'restore_us': 1e6 / rate(lambda: sim.restore_state(state), duration / 3),
+            'hash_us': 1e6 / rate(sim.state_hash, duration / 3)}
+
+
+def bench_fast_forward(duration):
+    """Swept simulation with the paddle held, advanced by up to a second per fast_forward() call"""
+    from simulation import Simulation
+
+    state = {'sim': Simulation(seed=0, swept=True), 'episodes': 0, 'calls': 0, 'ticks': 0}
+
+    def call():
+        sim = state['sim']
+        if sim.game_over or sim.ticks >= 20000:
+            state['episodes'] += 1
+            sim = state['sim'] = Simulation(seed=state['episodes'], swept=True)
+        state['ticks'] += sim.fast_forward(2, c.frame_rate)
+        state['calls'] += 1
+
+    calls_per_sec = rate(call, duration)
+    ticks_per_call = state['ticks'] / state['calls']
+    return {'calls_per_sec': calls_per_sec,
+            'ticks_per_call': ticks_per_call,
+            'ticks_per_sec': calls_per_sec * ticks_per_call}
+
+
+def bench_planner(duration):
+    from bot.planner import Planner, advance
+    from simulation import Simulation
+
+    results = {}
+    for prefix, workers in (('', 0), ('pool_', 2)):
+        planner = Planner(budget=0.01, workers=workers, seed=0)
+        sim = Simulation(seed=0)
+        end = time.perf_counter() + duration / 2
+        try:
+            while time.perf_counter() < end and not sim.game_over:
+                advance(sim, planner.plan(sim), planner.repeat, 0)
+        finally:
+            planner.close()
+        report = planner.report()
+        results[prefix + 'rollouts_per_sec'] = report['rollouts_per_sec']
+        results[prefix + 'nodes_per_sec'] = report['nodes_per_sec']
+    return results
+
+
+def bench_collision(duration):
+    from collision import intersect
+
+    paddle = pygame.Rect(195, 375, 110, 50)
+    ball = pygame.Rect(200, 365, 16, 16)
+    miss = pygame.Rect(200, 100, 16, 16)
+    return {'intersect_hit_ns': 1e9 / rate(lambda: intersect(paddle, ball), duration / 2),
+            'intersect_miss_ns': 1e9 / rate(lambda: intersect(paddle, miss), duration / 2)}
+
+
+def bench_round_rect(duration):
+    from roundrects import aa_round_rect, cached_aa_round_rect
+
+    surface = pygame.Surface((c.screen_width, c.screen_height))
+    rect = (10, 10, c.brick_width, c.brick_height)
+    return {'aa_round_rect_us': 1e6 / rate(lambda: aa_round_rect(surface, rect, c.brick_color, rad=7),
+                                           duration / 2),
+            'cached_aa_round_rect_us': 1e6 / rate(lambda: cached_aa_round_rect(surface, rect, c.brick_color, rad=7),
+                                                  duration / 2)}
+
+
+def bench_render(duration):
+    from breakout import Breakout
+
+    results = {}
+    for dirty_rects in (False, True):
+        breakout = Breakout()
+        breakout.dirty_rects = dirty_rects
+        breakout.is_game_running = True
+        for b in breakout.menu_buttons:
+            breakout.objects.remove(b)
+
+        def frame():
+            breakout.sim.update()
+            breakout.render()
+
+        results['dirty_rects_fps' if dirty_rects else 'full_fps'] = rate(frame, duration / 2)
+    return results
+
+
+def bench_env(duration):
+    from breakout import BreakoutEnv
+
+    env = BreakoutEnv()
+    state = {'observation': env.reset(seed=0)}
+
+    def step():
+        observation, reward, done = env.step(get_action(*state['observation']))
+        if done or env.steps >= 20000:
+            observation = env.reset(seed=env.episodes)
+        state['observation'] = observation
+
+    return {'steps_per_sec': rate(step, duration)}
+
+
+def bench_vec_env(duration, n=256):
+    try:
+        import numpy as np
+        from vec_env import VecBreakoutEnv
+    except ImportError:
+        return None
+
+    env = VecBreakoutEnv(n, seed=0)
+    state = {'observation': env.observe()}
+
+    def step():
+        observation = state['observation']
+        state['observation'] = env.step(np.where(observation[:, 0] < observation[:, 1], 1, 0))[0]
+
+    return {'envs': n, 'steps_per_sec': rate(step, duration) * n}
+
+
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from breakout import BreakoutEnv
+env = BreakoutEnv()
+env.reset()
+env.step(2)
+print(time.perf_counter() - start)
+'''
+
+
+def bench_startup(runs=5):
+    here = os.path.dirname(os.path.abspath(__file__))
+    first_step = []
+    process = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here, capture_output=True,
+                                text=True, check=True).stdout
+        process.append(time.perf_counter() - start)
+        first_step.append(float(output.split()[-1]))
+    return {'import_to_first_step_ms': min(first_step) * 1000,
+            'process_ms': min(process) * 1000}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Breakout performance benchmarks')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per benchmark')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+    args = parser.parse_args()
+
+    benchmarks = (('simulation', bench_simulation),
+                  ('fast_forward', bench_fast_forward),
+                  ('snapshot', bench_snapshot),
+                  ('planner', bench_planner),
+                  ('collision', bench_collision),
+                  ('round_rect', bench_round_rect),
+                  ('render', bench_render),
+                  ('env', bench_env),
+                  ('vec_env', bench_vec_env))
+    results = {}
+    for name, bench in benchmarks:
+        results[name] = bench(args.duration)
+        print(name, results[name])
+    results['startup'] = bench_startup()
+    print('startup', results['startup'])
+
+    report = dict(commit=git_commit(),
+                  python=platform.python_version(),
+                  pygame=pygame.version.ver,
+                  machine=platform.machine(),
+                  duration=args.duration,
+                  results=results)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
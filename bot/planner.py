@@ -0,0 +1,288 @@
+"""
+Lookahead bot planning with Monte Carlo tree search over simulation snapshots.
+
+Every tree node holds a Simulation.clone_state() snapshot. Edges apply an
+action for ``repeat`` ticks. Leaves are evaluated by rollouts that follow
+the reactive get_action rule with some random moves. Nodes are shared
+through a transposition table keyed by Simulation.state_hash(), so action
+sequences reaching the same state are searched once.
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import config as c
+from simulation import Simulation
+from .main import get_action
+
+ACTIONS = (0, 1, 2)
+
+
+def rollout_action(sim, rng, epsilon):
+    if rng.random() < epsilon:
+        return rng.choice(ACTIONS)
+    ball = sim.ball.bounds
+    return get_action(sim.paddle.bounds.x + c.paddle_width // 2, ball.x, ball.y + c.ball_radius, sim.ball.speed)
+
+
+def advance(sim, action, ticks, life_penalty):
+    """Apply action for up to ticks and return the reward, stopping when a life is lost
+
+    Swept simulations jump over the ticks between ball events.
+    """
+    score = sim.score
+    lives = sim.lives
+    while ticks:
+        ticks -= sim.fast_forward(action, ticks)
+        if sim.game_over or sim.lives < lives:
+            break
+    reward = sim.score - score
+    if sim.lives < lives:
+        reward -= life_penalty
+    return reward
+
+
+def rollout(sim, steps, repeat, life_penalty, rng, epsilon=0.1):
+    """Play steps moves of repeat ticks from the state of sim and return the reward"""
+    total = 0
+    for _ in range(steps):
+        if sim.game_over:
+            break
+        total += advance(sim, rollout_action(sim, rng, epsilon), repeat, life_penalty)
+    return total
+
+
+_worker_sims = {}
+
+
+def _init_worker():
+    # Let the planning process preempt rollouts so it keeps its deadline
+    if hasattr(os, 'nice'):
+        os.nice(5)
+
+
+def _rollout_task(swept, repeat, life_penalty, jobs):
+    """Run the (state, steps, seed) rollouts of jobs and return their rewards and the seconds taken
+
+    Pool processes keep one simulation per collision mode between tasks.
+    """
+    start = time.perf_counter()
+    sim = _worker_sims.get(swept)
+    if sim is None:
+        sim = _worker_sims[swept] = Simulation(swept=swept)
+    values = []
+    for state, steps, seed in jobs:
+        sim.restore_state(state)
+        values.append(rollout(sim, steps, repeat, life_penalty, random.Random(seed)))
+    return values, time.perf_counter() - start
+
+
+class Node:
+    def __init__(self, state, reward, terminal):
+        self.state = state
+        # Reward for moving into this node
+        self.reward = reward
+        self.terminal = terminal
+        self.children = {}
+        self.visits = 0
+        self.total = 0.0
+
+    def value(self):
+        return self.total / self.visits if self.visits else 0.0
+
+
+class Planner:
+    """Picks actions by Monte Carlo tree search within a time budget
+
+    plan() searches for budget seconds and returns the most visited root
+    action. With workers > 0 rollouts run in a process pool, up to batch
+    leaves per task with two tasks per worker in flight, so a round trip to
+    the pool pays for many rollouts. Pending rollouts count as visits,
+    which spreads the leaves of a batch over the tree.
+
+    Searching stops before the budget runs out. Inline, another iteration
+    only starts if the average iteration still fits. With a pool, batches
+    shrink to a quarter of the budget worth of rollouts, new tasks are only
+    submitted if they should finish in time, and tasks still running at
+    the deadline are dropped. The transposition table keeps nodes between
+    moves until it holds max_nodes. stats counts nodes, rollouts and search
+    time over all moves.
+    """
+
+    def __init__(self, budget=0.01, repeat=4, horizon=16, exploration=1.0, life_penalty=10, discount=0.99,
+                 workers=0, batch=8, max_nodes=20000, seed=None):
+        self.budget = budget
+        self.repeat = repeat
+        self.horizon = horizon
+        self.exploration = exploration
+        self.life_penalty = life_penalty
+        self.discount = discount
+        self.batch = batch
+        self.workers = workers
+        self.in_flight = 2 * workers
+        self.max_nodes = max_nodes
+        self.rng = random.Random(seed)
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker) if workers else None
+        self.table = {}
+        self.sims = {}
+        self.buffer = None
+        # Moving averages of the seconds an inline iteration and a pool rollout take
+        self.iteration_time = 0.0
+        self.rollout_time = 0.0
+        self.stats = dict(moves=0, nodes=0, rollouts=0, time=0.0)
+
+    def scratch(self, swept):
+        sim = self.sims.get(swept)
+        if sim is None:
+            sim = self.sims[swept] = Simulation(swept=swept)
+        return sim
+
+    def node(self, sim, reward):
+        """Return the node for the state of sim, adding it to the table if new"""
+        if self.buffer is None or len(self.buffer) != sim.state_size():
+            self.buffer = bytearray(sim.state_size())
+        state = sim.clone_state(self.buffer)
+        key = sim.state_hash(state)
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = Node(bytes(state), reward, sim.game_over)
+            self.stats['nodes'] += 1
+        return node
+
+    def select(self, root, sim):
+        """Walk down by UCT and expand one child, returning the path"""
+        path = [root]
+        node = root
+        while not node.terminal and len(path) <= self.horizon:
+            untried = [action for action in ACTIONS if action not in node.children]
+            if untried:
+                action = self.rng.choice(untried)
+                sim.restore_state(node.state)
+                reward = advance(sim, action, self.repeat, self.life_penalty)
+                child = node.children[action] = self.node(sim, reward)
+                path.append(child)
+                return path
+            log_visits = math.log(node.visits + 1)
+            node = max(node.children.values(),
+                       key=lambda child: child.value() + self.exploration * math.sqrt(log_visits / (child.visits + 1)))
+            path.append(node)
+        return path
+
+    def backup(self, path, value):
+        for node in reversed(path):
+            value = node.reward + self.discount * value
+            node.visits += 1
+            node.total += value
+
+    def start(self, root, sim, count):
+        """Select count leaves and return their paths and rollout task arguments"""
+        paths = []
+        jobs = []
+        for _ in range(count):
+            path = self.select(root, sim)
+            # Pending rollouts count as visits so a batch spreads out
+            for node in path:
+                node.visits += 1
+            paths.append(path)
+            jobs.append((path[-1].state, self.horizon - len(path) + 1, self.rng.getrandbits(32)))
+        return paths, (sim.swept, self.repeat, self.life_penalty, jobs)
+
+    def finish(self, paths, values=None):
+        """Back up the rollout values of paths, or only undo their pending visits without values"""
+        for i, path in enumerate(paths):
+            for node in path:
+                node.visits -= 1
+            if values is not None:
+                self.backup(path, values[i])
+        if values is not None:
+            self.stats['rollouts'] += len(paths)
+
+    def plan(self, sim):
+        """Return the action to take in the state of sim"""
+        start = time.perf_counter()
+        deadline = start + self.budget
+        if len(self.table) > self.max_nodes:
+            self.table.clear()
+        scratch = self.scratch(sim.swept)
+        root = self.node(sim, 0)
+        if root.terminal:
+            return 2
+        if self.pool is None:
+            now = time.perf_counter()
+            while now + self.iteration_time < deadline:
+                paths, task = self.start(root, scratch, 1)
+                self.finish(paths, _rollout_task(*task)[0])
+                last, now = now, time.perf_counter()
+                self.iteration_time += 0.1 * (now - last - self.iteration_time)
+        else:
+            batch = self.batch
+            if self.rollout_time:
+                batch = max(min(batch, int(self.budget / (4 * self.rollout_time))), 1)
+            pending = {}
+            while True:
+                now = time.perf_counter()
+                # Tasks queued before a new one delay it by their run time
+                while (len(pending) < self.in_flight and
+                       now + (len(pending) // self.workers + 1) * batch * self.rollout_time < deadline):
+                    paths, task = self.start(root, scratch, batch)
+                    pending[self.pool.submit(_rollout_task, *task)] = paths
+                    now = time.perf_counter()
+                if not pending or now >= deadline:
+                    break
+                done, _ = wait(pending, timeout=deadline - now, return_when=FIRST_COMPLETED)
+                for future in done:
+                    paths = pending.pop(future)
+                    values, seconds = future.result()
+                    self.finish(paths, values)
+                    self.rollout_time += 0.1 * (seconds / len(values) - self.rollout_time)
+            for future, paths in pending.items():
+                future.cancel()
+                self.finish(paths)
+        self.stats['moves'] += 1
+        self.stats['time'] += time.perf_counter() - start
+        if not root.children:
+            return 2
+        return max(root.children, key=lambda action: root.children[action].visits)
+
+    def report(self):
+        """Return rollouts and nodes per second of search time"""
+        elapsed = self.stats['time'] or 1e-9
+        return dict(rollouts_per_sec=self.stats['rollouts'] / elapsed,
+                    nodes_per_sec=self.stats['nodes'] / elapsed,
+                    **self.stats)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a headless game with the planning bot')
+    parser.add_argument('--budget', type=float, default=0.01, help='seconds of search per move')
+    parser.add_argument('--workers', type=int, default=0, help='rollout processes, 0 runs rollouts inline')
+    parser.add_argument('--batch', type=int, default=8, help='rollouts per pool task')
+    parser.add_argument('--moves', type=int, default=500, help='maximum number of moves')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    planner = Planner(budget=args.budget, workers=args.workers, batch=args.batch, seed=args.seed)
+    sim = Simulation(args.seed)
+    try:
+        for _ in range(args.moves):
+            if sim.game_over:
+                break
+            advance(sim, planner.plan(sim), planner.repeat, 0)
+    finally:
+        planner.close()
+    print(f'score {sim.score}, lives {sim.lives}, ticks {sim.ticks}')
+    report = planner.report()
+    print(f'{report["rollouts_per_sec"]:.0f} rollouts/s, {report["nodes_per_sec"]:.0f} nodes/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import time
+start = time.perf_counter()
+
 import random
 import sys
 
@@ -8,5 +10,8 @@ env = BreakoutEnv()
 
 env.reset()
 
-while True:
-    env.step(0 if random.randint(0, 150) < 50 else 1)
+observation, reward, done = env.step(0 if random.randint(0, 150) < 50 else 1)
+print(f'First step after {(time.perf_counter() - start) * 1000:.1f} ms')
+while not done:
+    observation, reward, done = env.step(0 if random.randint(0, 150) < 50 else 1)
+print(f'Episode finished after {env.steps} steps')
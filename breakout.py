@@ -1,39 +1,61 @@
-import random
-from datetime import datetime, timedelta
-
 import os
 import sys
 import time
 import pygame
-import string
-import threading
-import bot
 from pygame.rect import Rect
 
 import config as c
-from objects import Ball, Brick, Button, Paddle, TextObject
+from assets import assets
+from objects import Button, Message, TextObject
 import colors
+from bot.main import get_action
 from collections import defaultdict
-from inputbox import ask
+from inputbox import InputBox
+from profiler import FrameProfiler, PerformanceHud
+from replay import Recorder
+from simulation import Simulation
 
 
 class Game:
-    """Base pygame game class"""
+    """Base pygame game class
+
+    Every frame of run() is timed per phase by self.profiler, F3 toggles an
+    overlay with the frame rate and frame times. While idle() is true run()
+    sleeps until input arrives and only draws frames in response to it.
+    """
+
+    phases = ('events', 'update', 'draw', 'display', 'tick')
+    # Milliseconds an idle game waits for input before checking again
+    idle_timeout = 500
 
-    def __init__(self, caption, width, height, back_image_filename, frame_rate):
-        self.background_image = pygame.image.load(back_image_filename)
+    def __init__(self, caption, width, height, back_image_filename, frame_rate, dirty_rects=False,
+                 headless=False, perf_hud=False, profile_csv=None):
         self.frame_rate = frame_rate
+        self.dirty_rects = dirty_rects
+        self.headless = headless
+        self.full_redraw = True
+        self.previous_rects = []
         self.game_over = False
         self.objects = []
-        pygame.mixer.pre_init(44100, 16, 2, 4096)
-        pygame.init()
-        pygame.font.init()
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        # Mixer and font are initialized by assets when first needed
+        pygame.display.init()
         self.surface = pygame.display.set_mode((width, height))
+        self.background_image = assets.image(back_image_filename)
         pygame.display.set_caption(caption)
         self.clock = pygame.time.Clock()
         self.keydown_handlers = defaultdict(list)
         self.keyup_handlers = defaultdict(list)
+        # Called with every pressed key, for text input
+        self.keypress_handlers = []
         self.mouse_handlers = []
+        self.profiler = FrameProfiler(self.phases, csv_path=profile_csv)
+        self.hud = PerformanceHud(self.profiler, width - 175, 5, frame_rate=frame_rate)
+        self.keydown_handlers[pygame.K_F3].append(self.toggle_hud)
+        if perf_hud:
+            self.toggle_hud()
 
     def update(self):
         """Update all objects"""
@@ -48,126 +70,202 @@ class Game:
     def handle_events(self):
         """Handle base events"""
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.game_over = True
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                for handler in self.keydown_handlers[event.key]:
-                    handler(event.key)
-            elif event.type == pygame.KEYUP:
-                for handler in self.keydown_handlers[event.key]:
-                    handler(event.key)
-            elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
-                for handler in self.mouse_handlers:
-                    handler(event.type, event.pos)
+            self.handle_event(event)
 
-    def run(self):
-        while not self.game_over:
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.game_over = True
+            self.profiler.close()
+            pygame.quit()
+            sys.exit()
+        elif event.type == pygame.KEYDOWN:
+            for handler in self.keydown_handlers[event.key]:
+                handler(event.key)
+            # Handlers may remove themselves
+            for handler in tuple(self.keypress_handlers):
+                handler(event.key)
+        elif event.type == pygame.KEYUP:
+            for handler in self.keyup_handlers[event.key]:
+                handler(event.key)
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
+            # Handlers may remove themselves
+            for handler in tuple(self.mouse_handlers):
+                handler(event.type, event.pos)
+
+    def idle(self):
+        """Whether frames only change in response to input"""
+        return False
+
+    def toggle_hud(self, key=None):
+        if self.hud in self.objects:
+            self.objects.remove(self.hud)
+        else:
+            self.objects.append(self.hud)
+
+    def dirty_bounds(self):
+        """Bounds of everything that may change between frames"""
+        return [o.bounds for o in self.objects]
+
+    def draw_dirty(self, rects):
+        """Draw objects after rects were restored from the background
+
+        Subclasses may append the bounds of anything else they restore to
+        rects, they are passed to pygame.display.update() afterwards.
+        """
+        self.draw()
+
+    def render(self):
+        """Draw one frame
+
+        In dirty rect mode only the previous and current bounds reported by
+        dirty_bounds() are restored from the background, redrawn and updated
+        on the display.
+        """
+        if self.dirty_rects and not self.full_redraw:
+            rects = self.previous_rects + [Rect(b).inflate(2, 2) for b in self.dirty_bounds()]
+            for rect in rects:
+                self.surface.blit(self.background_image, rect, rect)
+            self.draw_dirty(rects)
+            current = [Rect(b).inflate(2, 2) for b in self.dirty_bounds()]
+            self.profiler.lap('draw')
+            pygame.display.update(rects + current)
+        else:
             self.surface.blit(self.background_image, (0, 0))
+            self.draw()
+            self.profiler.lap('draw')
+            pygame.display.update()
+            self.full_redraw = False
+            current = [Rect(b).inflate(2, 2) for b in self.dirty_bounds()]
+        self.profiler.lap('display')
+        self.previous_rects = current
 
+    def run(self):
+        profiler = self.profiler
+        while not self.game_over:
+            event = None
+            if self.idle() and not self.full_redraw:
+                event = pygame.event.wait(self.idle_timeout)
+                if event.type == pygame.NOEVENT:
+                    continue
+            profiler.begin_frame()
+            if event is not None:
+                self.handle_event(event)
             self.handle_events()
+            profiler.lap('events')
             self.update()
-            self.draw()
-
-            pygame.display.update()
+            profiler.lap('update')
+            self.render()
             self.clock.tick(self.frame_rate)
+            profiler.lap('tick')
+            profiler.end_frame()
+        profiler.close()
 
 
-special_effects = dict(
-    long_paddle=(colors.ORANGE,
-                 lambda g: g.paddle.bounds.inflate_ip(c.paddle_width // 2, 0),
-                 lambda g: g.paddle.bounds.inflate_ip(-c.paddle_width // 2, 0)),
-    slow_ball=(colors.AQUAMARINE2,
-               lambda g: g.change_ball_speed(-1),
-               lambda g: g.change_ball_speed(1)),
-    tripple_points=(colors.DARKSEAGREEN4,
-                    lambda g: g.set_points_per_brick(3),
-                    lambda g: g.set_points_per_brick(1)),
-    extra_life=(colors.GOLD1,
-                lambda g: g.add_life(),
-                lambda g: None))
-
 assert os.path.isfile('sound_effects/brick_hit.wav')
 
 
 class Breakout(Game):
-    def __init__(self):
-        Game.__init__(self, 'Breakout', c.screen_width, c.screen_height, c.background_image, c.frame_rate)
-        self.sound_effects = {name: pygame.mixer.Sound(sound) for name, sound in c.sounds_effects.items()}
-        self.reset_effect = None
-        self.effect_start_time = None
-        self.score = 0
-        self.lives = c.initial_lives
+    """Renders a headless Simulation and feeds it player input
+
+    Besides the frame phases the profiler times collisions and movement
+    inside the simulation and playing sounds. While bot is set the bot
+    chooses the action of every tick instead of the player.
+    """
+
+    phases = Game.phases + ('collisions', 'movement', 'audio')
+
+    def __init__(self, sim=None):
+        Game.__init__(self, 'Breakout', c.screen_width, c.screen_height, c.background_image, c.frame_rate,
+                      c.dirty_rects, c.headless, c.perf_hud, c.profile_csv)
+        # Keep the overlay below the score and lives labels
+        self.hud.bounds.y = c.status_offset_y + c.font_size + 5
+        self.sound_effects = {}
+        if not self.headless:
+            # Loading on the first hit would stall a frame during play
+            self.sound_effects = {name: assets.sound(sound) for name, sound in c.sounds_effects.items()}
+        self.sim = Simulation() if sim is None else sim
+        self.sim.profiler = self.profiler
+        self.drawn_bricks = bytes(self.sim.bricks.alive)
         self.start_level = False
-        self.paddle = None
-        self.bricks = None
-        self.ball = None
+        self.message = None
+        self.prompt = None
         self.menu_buttons = []
         self.is_game_running = False
+        self.bot = False
+        self.planner = None
+        self.bot_move = 2
         self.create_objects()
-        self.points_per_brick = 1
-        self.pause = None
-        self.env = None
 
-    def add_life(self):
-        self.lives += 1
+    @property
+    def paddle(self):
+        return self.sim.paddle
 
-    def set_points_per_brick(self, points):
-        self.points_per_brick = points
+    @property
+    def ball(self):
+        return self.sim.ball
 
-    def change_ball_speed(self, dy):
-        self.ball.speed = (self.ball.speed[0], self.ball.speed[1] + dy)
+    @property
+    def bricks(self):
+        return self.sim.bricks
 
-    def change_paddle_speed(self, dy):
-        self.paddle.offset = dy
+    @property
+    def score(self):
+        return self.sim.score
 
-    def create_menu(self):
-        def on_play(button):
-            for b in self.menu_buttons:
-                self.objects.remove(b)
+    @property
+    def lives(self):
+        return self.sim.lives
 
+    def play_sound(self, name):
+        if self.headless:
+            return
+        self.sound_effects[name].play()
+
+    def ask_complexity(self, on_done, error=None):
+        """Show the complexity prompt, on_done is called once a valid complexity is set"""
+        def on_enter(text):
+            self.objects.remove(self.prompt)
+            self.keypress_handlers.remove(self.prompt.handle_key)
+            self.prompt = None
             try:
-                complexity = int(ask(self.surface, game=self))
+                complexity = int(text)
             except ValueError:
                 complexity = -1
+            if not 0 <= complexity <= 10:
+                self.ask_complexity(on_done, error='Write number in range [0; 10]')
+                return
+            self.sim.set_complexity(complexity)
+            on_done()
 
-            while not 0 <= complexity <= 10:
-                try:
-                    complexity = int(ask(self.surface, game=self, error='Write number in range [0; 10]'))
-                except ValueError:
-                    complexity = -1
-            k_comp = complexity*0.1 + 1
-            self.ball.speed = self.ball.speed[0], k_comp * c.ball_speed
-            c.ball_speed = self.ball.speed[1]
-
-            self.paddle.speed = (2-k_comp) * c.paddle_speed
+        self.prompt = InputBox(c.screen_width, c.screen_height, on_enter, error)
+        self.objects.append(self.prompt)
+        self.keypress_handlers.append(self.prompt.handle_key)
 
+    def create_menu(self):
+        def start_game():
             self.is_game_running = True
             self.start_level = True
 
+        def on_play(button):
+            self.remove_menu()
+            self.ask_complexity(start_game)
+
         def on_quit(button):
             self.game_over = True
             self.is_game_running = False
             self.game_over = True
 
+        def run_bot():
+            start_game()
+            if c.planning_bot:
+                from bot.planner import Planner
+
+                self.planner = Planner(budget=c.planner_budget)
+            self.bot = True
+
         def on_bot(button):
-            env = BreakoutEnv()
-            
-            self.env = env
-
-            env.reset()
-
-            while True:
-                try:
-                    env.events = pygame.event.get()
-                except Exception as e:
-                    print(e)
-                    print('Closed')
-                env.step(bot.get_action(env.breakout.paddle.bounds.x + c.paddle_width//2, env.breakout.ball.bounds.x, env.breakout.ball.bounds.y + c.ball_radius, env.breakout.ball.speed))
-                if env.breakout.game_over:
-                    sys.exit()
-                time.sleep(0.0001)
+            self.remove_menu()
+            self.ask_complexity(run_bot)
 
         for i, (text, click_handler) in enumerate((('PLAY', on_play), ('BOT', on_bot), ('QUIT', on_quit))):
             b = Button(c.menu_offset_x,
@@ -181,18 +279,17 @@ class Breakout(Game):
             self.menu_buttons.append(b)
             self.mouse_handlers.append(b.handle_mouse_event)
 
+    def remove_menu(self):
+        for b in self.menu_buttons:
+            self.objects.remove(b)
+            self.mouse_handlers.remove(b.handle_mouse_event)
+        self.menu_buttons = []
+
     def create_objects(self):
-        self.create_bricks()
-        self.create_paddle()
-        self.create_ball()
+        self.create_paddle_handlers()
         self.create_labels()
         self.create_menu()
 
-    def continue_pygame_loop(self):
-        if self.env is None:
-            return pygame.event.get()
-        return self.env.events
-
     def create_labels(self):
         self.score_label = TextObject(c.score_offset,
                                       c.status_offset_y,
@@ -209,157 +306,52 @@ class Breakout(Game):
                                       c.font_size)
         self.objects.append(self.lives_label)
 
-    def create_ball(self):
-        speed = (random.randint(-2, 2), c.ball_speed)
-        self.ball = Ball(c.screen_width // 2,
-                         c.screen_height // 2,
-                         c.ball_radius,
-                         c.ball_color,
-                         speed)
-        self.objects.append(self.ball)
-        self.pause = c.pause_ball * c.frame_rate
-
-    def create_paddle(self):
-        paddle = Paddle((c.screen_width - c.paddle_width) // 2,
-                        c.screen_height - c.paddle_height * 2,
-                        c.paddle_width,
-                        c.paddle_height,
-                        c.paddle_color,
-                        c.paddle_speed)
-        self.keydown_handlers[pygame.K_LEFT].append(paddle.handle)
-        self.keydown_handlers[pygame.K_RIGHT].append(paddle.handle)
-        self.keyup_handlers[pygame.K_LEFT].append(paddle.handle)
-        self.keyup_handlers[pygame.K_RIGHT].append(paddle.handle)
-        self.paddle = paddle
-        self.objects.append(self.paddle)
-
-    def create_bricks(self):
-        w = c.brick_width
-        h = c.brick_height
-        brick_count = c.screen_width // (w + 1)
-        offset_x = (c.screen_width - brick_count * (w + 1)) // 2
-
-        bricks = []
-        for row in range(c.row_count):
-            for col in range(brick_count):
-                effect = None
-                brick_color = c.brick_color
-                index = random.randint(0, 10)
-                if index < len(special_effects):
-                    brick_color, start_effect_func, reset_effect_func = list(special_effects.values())[index]
-                    effect = start_effect_func, reset_effect_func
-
-                brick = Brick(offset_x + col * (w + 1),
-                              c.offset_y + row * (h + 1),
-                              w,
-                              h,
-                              brick_color,
-                              effect)
-                bricks.append(brick)
-                self.objects.append(brick)
-        self.bricks = bricks
-
-    def handle_ball_collisions(self):
-        def intersect(obj, ball):
-            edges = dict(left=Rect(obj.left, obj.top, 1, obj.height),
-                         right=Rect(obj.right, obj.top, 1, obj.height),
-                         top=Rect(obj.left, obj.top, obj.width, 1),
-                         bottom=Rect(obj.left, obj.bottom, obj.width, 1))
-            collisions = set(edge for edge, rect in edges.items() if ball.bounds.colliderect(rect))
-            if not collisions:
-                return None
-
-            if len(collisions) == 1:
-                return list(collisions)[0]
-
-            if 'top' in collisions:
-                if ball.centery >= obj.top:
-                    return 'top'
-                if ball.centerx < obj.left:
-                    return 'left'
-                else:
-                    return 'right'
-
-            if 'bottom' in collisions:
-                if ball.centery >= obj.bottom:
-                    return 'bottom'
-                if ball.centerx < obj.left:
-                    return 'left'
-                else:
-                    return 'right'
-
-        self.ball.color = colors.SKYBLUE
-
-        flag = False
-
-        # Hit paddle
-        s = self.ball.speed
-        edge = intersect(self.paddle, self.ball)
-        if edge is not None:
-            self.sound_effects['paddle_hit'].play()
-            self.ball.color = colors.RED4
-        if edge == 'top':
-            speed_x = s[0]
-            speed_y = -s[1]
-            if self.paddle.moving_left:
-                speed_x -= 1
-            elif self.paddle.moving_right:
-                speed_x += 1
-            self.ball.speed = speed_x, speed_y
-        elif edge in ('left', 'right'):
-            self.ball.speed = (-s[0], s[1])
-
-        # Hit ceiling
-        if self.ball.top <= 0:
-            self.sound_effects['wall_hit'].play()
-            self.ball.color = colors.RED1
-            flag = True
-            self.ball.speed = (s[0], -s[1])
-
-        # Hit floor
-        if self.ball.top >= c.screen_height:
-            flag = True
-            self.lives -= 1
-            if self.lives == 0:
-                self.game_over = True
-            else:
-                self.create_ball()
-
-        # Hit wall
-        if (self.ball.left <= 0 or self.ball.right >= c.screen_width) and not flag:
-            self.ball.color = colors.RED1
-            self.sound_effects['wall_hit'].play()
-            self.ball.speed = (-s[0], s[1])
-
-        # Hit brick
-        for brick in self.bricks:
-            edge = intersect(brick, self.ball)
-            if not edge:
-                continue
-
-            self.sound_effects['brick_hit'].play()
-            self.bricks.remove(brick)
-            self.ball.color = colors.RED1
-            self.objects.remove(brick)
-            self.score += self.points_per_brick
-
-            if edge in ('top', 'bottom'):
-                self.ball.speed = (s[0], -s[1])
-            else:
-                self.ball.speed = (-s[0], s[1])
+    def create_paddle_handlers(self):
+        self.keydown_handlers[pygame.K_LEFT].append(self.handle_paddle)
+        self.keydown_handlers[pygame.K_RIGHT].append(self.handle_paddle)
+        self.keyup_handlers[pygame.K_LEFT].append(self.handle_paddle)
+        self.keyup_handlers[pygame.K_RIGHT].append(self.handle_paddle)
+
+    def handle_paddle(self, key):
+        self.sim.paddle.handle(key)
+
+    def set_simulation(self, sim):
+        """Render sim from now on, dropping the message of the previous game"""
+        if self.message is not None:
+            self.message.on_expire = None
+            self.remove_message()
+        self.sim = sim
+        sim.profiler = self.profiler
+        self.drawn_bricks = bytes(sim.bricks.alive)
+        self.full_redraw = True
+        self.game_over = False
 
-            if brick.special_effect is not None:
-                # Reset previous effect if any
-                if self.reset_effect is not None:
-                    self.reset_effect(self)
+    def idle(self):
+        # Menu and complexity prompt only change on input
+        return not self.is_game_running and self.message is None
 
-                # Trigger special effect
-                self.effect_start_time = datetime.now()
-                brick.special_effect[0](self)
-                # Set current reset effect function
-                self.reset_effect = brick.special_effect[1]
+    def end_game(self):
+        self.is_game_running = False
+        self.game_over = True
+        if self.planner is not None:
+            self.planner.close()
+
+    def bot_action(self):
+        """Return the action of the bot for the next tick
+
+        The planner picks a new move every planner.repeat ticks.
+        """
+        sim = self.sim
+        if self.planner is None:
+            ball = sim.ball.bounds
+            return get_action(sim.paddle.bounds.x + c.paddle_width // 2, ball.x, ball.y + c.ball_radius,
+                              sim.ball.speed)
+        if sim.ticks % self.planner.repeat == 0:
+            self.bot_move = self.planner.plan(sim)
+        return self.bot_move
 
     def update(self):
+        self.update_message()
         if not self.is_game_running:
             return
 
@@ -367,136 +359,266 @@ class Breakout(Game):
             self.start_level = False
             self.show_message('GET READY!', centralized=True)
 
-        if not self.bricks:
-            self.show_message('YOU WIN!!!', centralized=True)
+        if self.sim.won:
             self.is_game_running = False
-            self.game_over = True
+            self.show_message('YOU WIN!!!', centralized=True, on_expire=self.end_game)
             return
 
-        if self.pause:
-            self.pause -= 1
-            self.paddle.update()
-            self.paddle.draw(self.surface)
-            return
-
-        # Reset special effect if needed
-        if self.reset_effect:
-            if datetime.now() - self.effect_start_time >= timedelta(seconds=c.effect_duration):
-                self.reset_effect(self)
-                self.reset_effect = None
-
-        self.handle_ball_collisions()
+        if self.bot:
+            self.sim.set_action(self.bot_action())
+        self.sim.update()
+        start = time.perf_counter()
+        for name in self.sim.sounds:
+            self.play_sound(name)
+        self.profiler.add('audio', time.perf_counter() - start)
         super().update()
 
-        if self.game_over:
-            self.show_message('GAME OVER!', centralized=True)
-
-    def show_message(self, text, color=colors.WHITE, font_name='Arial', font_size=20, centralized=False):
-        message = TextObject(c.screen_width // 2, c.screen_height // 2 + 20, lambda: text, color, font_name, font_size)
-        self.draw()
-        message.draw(self.surface, centralized)
-        pygame.display.update()
-        time.sleep(c.message_duration)
-
-    def game(self, env):
-        self.env = env
-        for b in self.menu_buttons:
-            self.objects.remove(b)
-
-        try:
-            complexity = int(ask(self.surface, game=self))
-        except ValueError:
-            complexity = -1
-
-        while not 0 <= complexity <= 10:
-            try:
-                complexity = int(ask(self.surface, game=self, error='Write number in range [0; 10]'))
-            except ValueError:
-                complexity = -1
-        k_comp = complexity * 0.1 + 1
-        self.ball.speed = self.ball.speed[0], k_comp * c.ball_speed
-        c.ball_speed = self.ball.speed[1]
-
-        self.paddle.speed = (2 - k_comp) * c.paddle_speed
-
-        self.is_game_running = True
-        self.start_level = True
-
-        while not self.is_game_running:
-            self.surface.blit(self.background_image, (0, 0))
-
-            self.handle_events()
-            self.update()
-            self.draw()
-
-            pygame.display.update()
-            self.clock.tick(self.frame_rate)
+        if self.sim.game_over:
+            self.is_game_running = False
+            self.show_message('GAME OVER!', centralized=True, on_expire=self.end_game)
 
-        while not self.game_over:
-            for event in self.continue_pygame_loop():
-                if event.type == pygame.QUIT:
-                    self.game_over = True
-                    self.is_game_running = False
-                    pygame.quit()
-                    sys.exit()
-            if env.new_step:
-                self.surface.blit(self.background_image, (0, 0))
-                # if env.action == 0:
-                #     self.paddle.moving_left = not self.paddle.moving_left
-                # elif env.action == 1:
-                #     self.paddle.moving_right = not self.paddle.moving_right
-                # else:
-                #     self.paddle.moving_right = False
-                #     self.paddle.moving_left = False
-
-                if env.action == 0:
-                    self.paddle.moving_left = True
-                    self.paddle.moving_right = False
-                elif env.action == 1:
-                    self.paddle.moving_right = True
-                    self.paddle.moving_left = False
-                else:
-                    self.paddle.moving_right = False
-                    self.paddle.moving_left = False
-
-                self.update()
-                self.draw()
-
-                pygame.display.update()
-                self.clock.tick(self.frame_rate)
-
-                env.new_step = False
-        pygame.quit()
-        sys.exit()
+    def draw(self):
+        self.sim.bricks.draw(self.surface)
+        self.drawn_bricks = bytes(self.sim.bricks.alive)
+        self.sim.paddle.draw(self.surface)
+        self.sim.ball.draw(self.surface)
+        super().draw()
+
+    def dirty_bounds(self):
+        bricks = self.sim.bricks
+        bounds = [self.sim.paddle.bounds, self.sim.ball.bounds] + super().dirty_bounds()
+        if bricks.alive != self.drawn_bricks:
+            bounds.extend(bricks.rect(i) for i, alive in enumerate(self.drawn_bricks) if alive and not bricks.alive[i])
+        return bounds
+
+    def draw_dirty(self, rects):
+        # Bricks under restored regions are restored and redrawn as a whole
+        bricks = self.sim.bricks
+        indices = set()
+        for rect in rects:
+            indices.update(bricks.query(rect))
+        for i in indices:
+            rect = bricks.rect(i)
+            self.surface.blit(self.background_image, rect, rect)
+            rects.append(rect)
+        bricks.draw(self.surface, indices)
+        self.drawn_bricks = bytes(bricks.alive)
+        self.sim.paddle.draw(self.surface)
+        self.sim.ball.draw(self.surface)
+        super().draw()
+
+    def show_message(self, text, color=colors.WHITE, font_name='Arial', font_size=20, centralized=False,
+                     on_expire=None):
+        """Show text over the game for message_duration seconds worth of ticks
+
+        The game keeps running while the message is shown, on_expire is
+        called once it disappears. Headless games skip the message.
+        """
+        self.remove_message()
+        if self.headless:
+            if on_expire is not None:
+                on_expire()
+            return
+        self.message = Message(c.screen_width // 2, c.screen_height // 2 + 20, text, color, font_name, font_size,
+                               c.message_duration * c.frame_rate, centralized, on_expire)
+        self.objects.append(self.message)
+
+    def update_message(self):
+        if self.message is not None:
+            self.message.tick()
+            if self.message.expired:
+                self.remove_message()
+
+    def remove_message(self):
+        message = self.message
+        if message is None:
+            return
+        self.objects.remove(message)
+        self.message = None
+        if message.on_expire is not None:
+            message.on_expire()
 
 
 class BreakoutEnv:
-    def __init__(self):
+    """Steps a Breakout simulation in lockstep with the caller
+
+    Without a renderer the env runs a headless Simulation. With a Breakout
+    renderer every step also updates and draws the game window. With record
+    every episode keeps a replay Recorder in sim.recorder.
+
+    With state_vector observations are float32 vectors in the layout of
+    state.py, written into one buffer that every step reuses. With pixels
+    observations are uint8 frames, see pixels.py. Both need NumPy.
+
+    Headless envs draw pixel observations into an offscreen frame.
+    pixel_size (width, height) downsamples frames to grayscale and
+    frame_stack returns the last frames stacked. Pixel observations are
+    views that are overwritten by the next step.
+
+    With action_repeat k every step applies the action for up to k ticks
+    and returns the summed reward. Repeating stops early when a life is
+    lost or the episode ends. Headless envs advance swept simulations with
+    Simulation.fast_forward(), unless frames are max-pooled. With max_pool pixel observations are the
+    maximum of the last two frames, which with k = 1 are the frames of this
+    and the previous step.
+    """
+
+    def __init__(self, breakout=None, record=False, pixels=False, pixel_size=None, frame_stack=1,
+                 state_vector=False, action_repeat=1, max_pool=False):
+        if pixels and state_vector:
+            raise ValueError('Choose either pixel or state vector observations')
+        if action_repeat < 1:
+            raise ValueError('action_repeat must be at least 1')
         self.episodes = 0
         self.steps = 0
-        self.new_step = False
-        self.action = None
+        self.breakout = breakout
+        self.record = record
+        self.sim = None
+        self.action_repeat = action_repeat
+        self.max_pool = pixels and max_pool
+        self.state_vector = state_vector
         self.state = None
+        self.state_remaining = None
+        if state_vector:
+            from state import write_state
+
+            self.write_state = write_state
+        self.pixels = pixels
+        self.renderer = None
+        self.observer = None
+        if pixels:
+            from pixels import FrameRenderer, PixelObserver, channel_offsets
+
+            if breakout is None:
+                self.renderer = FrameRenderer()
+                surface = self.renderer.surface
+            else:
+                surface = breakout.surface
+                if surface.get_bytesize() != 4:
+                    raise ValueError('Pixel observations need a 32 bit display')
+            if breakout is not None or pixel_size is not None or frame_stack > 1 or max_pool:
+                self.observer = PixelObserver(c.screen_width, c.screen_height, pixel_size, frame_stack,
+                                              surface.get_pitch() // 4, channel_offsets(surface))
+
+    def observe(self, reset=False):
+        """Return paddle center x, ball x, ball bottom y and ball speed, or the state vector or pixel
+        observation
+        """
+        if self.state_vector:
+            remaining = self.sim.bricks.remaining
+            bricks = reset or remaining != self.state_remaining
+            self.state_remaining = remaining
+            return self.write_state(self.sim, self.state, bricks)
+        if self.pixels:
+            return self.observe_pixels(reset)
+        paddle = self.sim.paddle
+        ball = self.sim.ball
+        return (paddle.bounds.x + c.paddle_width // 2,
+                ball.bounds.x,
+                ball.bounds.y + c.ball_radius,
+                ball.speed)
+
+    def frame_pixels(self, render=True):
+        """Return the current frame as flat 32 bit pixels, without drawing it again unless render"""
+        if self.breakout is None:
+            if render:
+                self.renderer.render(self.sim)
+            return self.renderer.pixels
+        from pixels import surface_pixels
+
+        return surface_pixels(self.breakout.surface)
 
-        self.breakout = None
-        self.breakout_game = None
-        
-        self.events = []
+    def observe_pixels(self, reset=False):
+        pixels = self.frame_pixels()
+        if self.observer is None:
+            return self.renderer.rgb
+        if reset:
+            return self.observer.reset(pixels)
+        return self.observer.observe(pixels)
 
     def step(self, action):
-        if self.breakout is None:
+        """Advance the game by action_repeat ticks and return (observation, reward, done)"""
+        if self.sim is None:
             raise EnvironmentError('You must run reset() before running step()')
         self.steps += 1
-        self.new_step = True
-        self.action = action
-
-    def reset(self):
+        score = self.sim.score
+        lives = self.sim.lives
+        repeat = self.action_repeat
+        if self.max_pool and repeat == 1:
+            # The frame of the previous step is still drawn
+            self.observer.hold(self.frame_pixels(render=False))
+        if self.breakout is None and not self.max_pool:
+            # Swept simulations jump over the ticks between ball events
+            remaining = repeat
+            while remaining:
+                remaining -= self.sim.fast_forward(action, remaining)
+                done = self.sim.game_over
+                if done or self.sim.lives < lives:
+                    break
+            return self.observe(), self.sim.score - score, done
+        for i in range(repeat):
+            done = self.tick(action)
+            if done or self.sim.lives < lives:
+                break
+            if self.max_pool and i == repeat - 2:
+                self.observer.hold(self.frame_pixels())
+        return self.observe(), self.sim.score - score, done
+
+    def tick(self, action):
+        """Advance the game by one tick and return whether it is over"""
+        if self.breakout is None:
+            self.sim.step(action)
+            return self.sim.game_over
+        profiler = self.breakout.profiler
+        profiler.begin_frame()
+        # Keeps the window responsive, QUIT exits and F3 toggles the overlay
+        self.breakout.handle_events()
+        profiler.lap('events')
+        self.sim.set_action(action)
+        self.breakout.update()
+        profiler.lap('update')
+        self.breakout.render()
+        self.breakout.clock.tick(self.breakout.frame_rate)
+        profiler.lap('tick')
+        profiler.end_frame()
+        # The GAME OVER or YOU WIN message plays out after the episode
+        return self.sim.game_over or self.sim.won
+
+    def reset(self, seed=None):
+        """Start a new episode, recording its actions in sim.recorder if enabled
+
+        With a renderer the first episode plays the simulation of the
+        renderer if it has not started yet and no seed is given. Otherwise
+        the episode plays a new simulation with the same complexity and
+        collision mode.
+        """
         self.episodes += 1
         self.steps = 0
-        self.breakout = Breakout()
+        if self.breakout is None:
+            self.sim = Simulation(seed)
+        else:
+            sim = self.breakout.sim
+            if seed is not None or sim.ticks or sim.game_over:
+                sim = Simulation(seed, sim.swept)
+                if self.breakout.sim.complexity is not None:
+                    sim.set_complexity(self.breakout.sim.complexity)
+                self.breakout.set_simulation(sim)
+            self.breakout.is_game_running = True
+            self.sim = sim
+            # Pixel observations read the display, which still shows the last game
+            self.breakout.render()
+        if self.record:
+            self.sim.recorder = Recorder(self.sim)
+        if self.state_vector:
+            from state import state_size
+
+            size = state_size(self.sim)
+            if self.state is None or len(self.state) != size:
+                import numpy as np
+
+                self.state = np.zeros(size, dtype=np.float32)
+        return self.observe(reset=True)
 
-        self.breakout_game = threading.Thread(target=self.breakout.game, args=(self, ))
-        self.breakout_game.start()
 
 def main():
     Breakout().run()
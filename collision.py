@@ -0,0 +1,100 @@
+"""
+Ball against box collision tests computed directly from rect coordinates.
+
+A box is hit on one of its four 1 pixel edges: left and top edges lie on the
+first row/column of the box, right and bottom edges on the row/column just
+past it. When the ball box touches two edges at once the ball center decides
+which one counts.
+"""
+
+LEFT = 'left'
+RIGHT = 'right'
+TOP = 'top'
+BOTTOM = 'bottom'
+
+
+def intersect(rect, ball):
+    """Return the side of rect hit by the ball rect or None"""
+    return hit_side(rect.x, rect.y, rect.x + rect.w, rect.y + rect.h, ball)
+
+
+def hit_side(left, top, right, bottom, ball):
+    """Return the side of the box hit by the ball rect or None"""
+    x0 = ball.x
+    y0 = ball.y
+    x1 = x0 + ball.w
+    y1 = y0 + ball.h
+
+    # Reject boxes not touching any edge
+    if x0 > right or x1 <= left or y0 > bottom or y1 <= top:
+        return None
+
+    in_x = x0 < right and left < x1
+    in_y = y0 < bottom and top < y1
+    hit_left = in_y and x0 <= left
+    hit_right = in_y and right < x1
+    hit_top = in_x and y0 <= top
+    hit_bottom = in_x and bottom < y1
+
+    count = hit_left + hit_right + hit_top + hit_bottom
+    if count == 1:
+        if hit_top:
+            return TOP
+        if hit_bottom:
+            return BOTTOM
+        return LEFT if hit_left else RIGHT
+
+    if hit_top:
+        if y0 + ball.h // 2 >= top:
+            return TOP
+        return LEFT if x0 + ball.w // 2 < left else RIGHT
+
+    if hit_bottom:
+        if y0 + ball.h // 2 >= bottom:
+            return BOTTOM
+        return LEFT if x0 + ball.w // 2 < left else RIGHT
+
+    return None
+
+
+def sweep(x, y, vx, vy, left, top, right, bottom):
+    """Return (time, side) of point (x, y) moving by (vx, vy) per tick first
+    touching the box, or None
+
+    Only contacts at time >= 0 while the point moves towards the box count.
+    A ball rect is swept by passing its top left corner and the box grown
+    by the ball size to the left and top.
+    """
+    if vx > 0:
+        tx = (left - x) / vx
+        tx_exit = (right - x) / vx
+    elif vx < 0:
+        tx = (right - x) / vx
+        tx_exit = (left - x) / vx
+    elif left < x < right:
+        tx = float('-inf')
+        tx_exit = float('inf')
+    else:
+        return None
+
+    if vy > 0:
+        ty = (top - y) / vy
+        ty_exit = (bottom - y) / vy
+    elif vy < 0:
+        ty = (bottom - y) / vy
+        ty_exit = (top - y) / vy
+    elif top < y < bottom:
+        ty = float('-inf')
+        ty_exit = float('inf')
+    else:
+        return None
+
+    if tx > ty:
+        entry = tx
+        side = LEFT if vx > 0 else RIGHT
+    else:
+        entry = ty
+        side = TOP if vy > 0 else BOTTOM
+    if entry < 0 or entry >= min(tx_exit, ty_exit):
+        return None
+    return entry, side
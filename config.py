@@ -54,3 +54,16 @@ menu_button_w = 80
 menu_button_h = 50
 
 pause_ball = 3
+
+dirty_rects = False
+
+headless = False
+
+swept_collisions = False
+max_bounces = 8
+
+perf_hud = False
+profile_csv = None
+
+planning_bot = False
+planner_budget = 0.01
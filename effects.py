@@ -0,0 +1,109 @@
+"""
+Tick-based scheduling of special effects.
+
+Every effect type has a stacking rule for when it is triggered again while
+active:
+
+REFRESH  the running effect is kept and its expiry restarts
+STACK    the effect is applied again and every instance expires on its own
+INSTANT  the effect is applied once and never expires
+"""
+
+import heapq
+
+REFRESH = 'refresh'
+STACK = 'stack'
+INSTANT = 'instant'
+
+
+class EffectScheduler:
+    """Active special effects ordered by the tick they expire on
+
+    table holds (color, start, reset, stacking) per effect type, effect id
+    i refers to table[i - 1]. Start and reset functions are called with the
+    target passed to trigger() and expire(). Expiries are kept in a min-heap
+    of (tick, serial, effect id) entries. Refreshing an effect pushes a new
+    entry and leaves the old one behind, stale entries are dropped when they
+    reach the top of the heap. The serial number orders effects expiring on
+    the same tick by trigger order, so expiry is deterministic.
+    """
+
+    def __init__(self, table, duration):
+        self.table = table
+        self.duration = duration
+        self.heap = []
+        self.serial = 0
+        # Count of running instances per effect id
+        self.active = {}
+        # Serial of the valid heap entry per refreshed effect id
+        self.latest = {}
+
+    def __len__(self):
+        return sum(self.active.values())
+
+    def __contains__(self, effect):
+        return self.active.get(effect, 0) > 0
+
+    def trigger(self, effect, target, tick):
+        """Start effect on target at tick according to its stacking rule"""
+        _, start, _, stacking = self.table[effect - 1]
+        if stacking == INSTANT:
+            start(target)
+            return
+        if stacking != REFRESH or effect not in self:
+            start(target)
+            self.active[effect] = self.active.get(effect, 0) + 1
+        self.serial += 1
+        if stacking == REFRESH:
+            self.latest[effect] = self.serial
+        heapq.heappush(self.heap, (tick + self.duration, self.serial, effect))
+
+    def _drop_stale(self):
+        heap = self.heap
+        while heap:
+            _, serial, effect = heap[0]
+            if effect in self.latest and self.latest[effect] != serial:
+                heapq.heappop(heap)
+            else:
+                break
+
+    def entries(self):
+        """Return the (tick, serial, effect id) entries of all running effect instances"""
+        return [entry for entry in self.heap if self.latest.get(entry[2], entry[1]) == entry[1]]
+
+    def load(self, entries, serial):
+        """Replace the running effects by entries from entries(), without starting them"""
+        self.heap = list(entries)
+        heapq.heapify(self.heap)
+        self.serial = serial
+        self.active = {}
+        self.latest = {}
+        for _, entry_serial, effect in self.heap:
+            self.active[effect] = self.active.get(effect, 0) + 1
+            if self.table[effect - 1][3] == REFRESH:
+                self.latest[effect] = entry_serial
+
+    def expiries(self):
+        """Return the tick the last instance of every active effect id expires on"""
+        expiries = {}
+        for tick, serial, effect in self.heap:
+            if self.latest.get(effect, serial) == serial and tick > expiries.get(effect, tick - 1):
+                expiries[effect] = tick
+        return expiries
+
+    def next_expiry(self):
+        """Return the tick the next effect expires on or None"""
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def expire(self, target, tick):
+        """Reset every effect expiring on or before tick"""
+        heap = self.heap
+        while True:
+            self._drop_stale()
+            if not heap or heap[0][0] > tick:
+                return
+            _, _, effect = heapq.heappop(heap)
+            self.latest.pop(effect, None)
+            self.active[effect] -= 1
+            self.table[effect - 1][2](target)
@@ -16,71 +16,101 @@ import pygame, pygame.font, pygame.event, pygame.draw, string
 from pygame.locals import *
 import sys
 
+from assets import assets
+
 
 def get_key(game=None):
     while 1:
-        for event in game.continue_pygame_loop():
-            if event.type == KEYDOWN:
-                return event.key
-            elif event.type == pygame.QUIT:
+        # Block until input arrives instead of polling
+        event = pygame.event.wait()
+        if event.type == KEYDOWN:
+            return event.key
+        elif event.type == pygame.QUIT:
+            if game is not None:
                 game.game_over = True
-                pygame.quit()
-                sys.exit()
-            else:
-                pass
-
-
-def display_box(screen, message, error=None):
-    "Print a message in a box in the middle of the screen"
-    fontobject = pygame.font.Font(None, 20)
-    fontobject2 = pygame.font.Font(None, 26)
-    pygame.draw.rect(screen, (0, 0, 0),
-                     ((screen.get_width() / 2) - 100,
-                      (screen.get_height() / 2) - 10,
-                      200, 20), 0)
-    pygame.draw.rect(screen, (255, 255, 255),
-                     ((screen.get_width() / 2) - 102,
-                      (screen.get_height() / 2) - 12,
-                      204, 24), 1)
-    if len(message) != 0:
-        screen.blit(fontobject2.render(message, 1, (255, 255, 255)),
-                    ((screen.get_width() / 2) - 100, (screen.get_height() / 2) - 10))
-
-    screen.blit(fontobject2.render('Press <ENTER> to continue', 1, (255, 255, 255)),
-                ((screen.get_width() / 2) - 150, (screen.get_height() / 2) + 50))
-
-
-    screen.blit(fontobject2.render('Write complexity of game', 1, (255, 255, 255)),
-                ((screen.get_width() / 2) - 100, (int(screen.get_height() / 4))))
-    screen.blit(fontobject2.render('(0 - noob, 10 - pro)', 1, (255, 255, 255)),
-                ((screen.get_width() / 2) - 100, (int(screen.get_height() / 4) + 20)))
-
-    if error:
-        screen.blit(fontobject2.render(error, 1, (255, 0, 0)),
-                    ((screen.get_width() / 2) - 120, 50))
+            pygame.quit()
+            sys.exit()
 
-    pygame.display.flip()
+
+class InputBox:
+    """Complexity prompt in the middle of the screen
+
+    Keys are passed to handle_key(), on_enter is called with the entered
+    text when <ENTER> is pressed. Fonts and labels are rendered once, the
+    entered text only when it changes.
+    """
+
+    question = 'Complexity'
+
+    def __init__(self, width, height, on_enter, error=None):
+        self.width = width
+        self.height = height
+        self.on_enter = on_enter
+        self.error = error
+        self.current_string = []
+        self.labels = None
+        self.rendered = None
+        self.bounds = Rect(0, 50, width, height // 2 + 20)
+
+    def handle_key(self, key):
+        self.error = None
+        if key == K_BACKSPACE:
+            self.current_string = self.current_string[0:-1]
+        elif key in (pygame.K_RETURN, 271, K_RETURN):
+            self.on_enter(''.join(self.current_string))
+        elif key == K_MINUS:
+            self.current_string.append("_")
+        elif key <= 127:
+            if chr(key).isdigit():
+                self.current_string.append(chr(key))
+
+    def update(self):
+        pass
+
+    def draw(self, surface):
+        "Print a message in a box in the middle of the screen"
+        font = assets.font(None, 26)
+        w = self.width
+        h = self.height
+        if self.labels is None:
+            self.labels = [(font.render('Press <ENTER> to continue', 1, (255, 255, 255)),
+                            ((w / 2) - 150, (h / 2) + 50)),
+                           (font.render('Write complexity of game', 1, (255, 255, 255)),
+                            ((w / 2) - 100, (int(h / 4)))),
+                           (font.render('(0 - noob, 10 - pro)', 1, (255, 255, 255)),
+                            ((w / 2) - 100, (int(h / 4) + 20)))]
+        message = self.question + ": " + ''.join(self.current_string)
+        if self.rendered is None or self.rendered[0] != message:
+            self.rendered = message, font.render(message, 1, (255, 255, 255))
+
+        pygame.draw.rect(surface, (0, 0, 0),
+                         ((w / 2) - 100,
+                          (h / 2) - 10,
+                          200, 20), 0)
+        pygame.draw.rect(surface, (255, 255, 255),
+                         ((w / 2) - 102,
+                          (h / 2) - 12,
+                          204, 24), 1)
+        surface.blit(self.rendered[1], ((w / 2) - 100, (h / 2) - 10))
+        for label, pos in self.labels:
+            surface.blit(label, pos)
+
+        if self.error:
+            surface.blit(font.render(self.error, 1, (255, 0, 0)),
+                         ((w / 2) - 120, 50))
 
 
 def ask(screen, error=None, game=None):
     "ask(screen, question) -> answer"
-    question = 'Complexity'
-    pygame.font.init()
-    current_string = []
-    display_box(screen, question + ": " + ''.join(current_string), error=error)
-    while 1:
-        inkey = get_key(game=game)
-        if inkey == K_BACKSPACE:
-            current_string = current_string[0:-1]
-        elif inkey in (pygame.K_RETURN, 271, K_RETURN):
-            break
-        elif inkey == K_MINUS:
-            current_string.append("_")
-        elif inkey <= 127:
-            if chr(inkey).isdigit():
-                current_string.append(chr(inkey))
-        display_box(screen, question + ": " + ''.join(current_string))
-    return ''.join(current_string)
+    answer = []
+    box = InputBox(screen.get_width(), screen.get_height(), answer.append, error)
+    box.draw(screen)
+    pygame.display.flip()
+    while not answer:
+        box.handle_key(get_key(game=game))
+        box.draw(screen)
+        pygame.display.flip()
+    return answer[0]
 
 
 def main():
@@ -1,7 +1,10 @@
+from array import array
+
 from pygame.rect import Rect
-from roundrects import aa_round_rect
+from roundrects import cached_aa_round_rect
 import pygame
 import config as c
+from assets import assets
 
 
 class GameObject:
@@ -62,6 +65,8 @@ class GameObject:
 class Ball(GameObject):
     def __init__(self, x, y, r, color, speed):
         GameObject.__init__(self, x - r, y - r, r * 2, r * 2, speed)
+        # Exact top left position, fractional with swept collisions
+        self.pos = (float(x - r), float(y - r))
         self.radius = r
         self.diameter = r * 2
         self.color = color
@@ -71,16 +76,70 @@ class Ball(GameObject):
 
     def update(self):
         super().update()
-
-
-class Brick(GameObject):
-    def __init__(self, x, y, w, h, color, special_effect=None):
-        GameObject.__init__(self, x, y, w, h)
-        self.color = color
-        self.special_effect = special_effect
-
-    def draw(self, surface):
-        aa_round_rect(surface, self.bounds, self.color, rad=7)
+        self.pos = (float(self.bounds.x), float(self.bounds.y))
+
+
+class BrickWall:
+    """Grid of bricks stored in flat arrays
+
+    Brick i sits in row i // cols and column i % cols. Per brick only the
+    position, color index, effect id and an alive flag are kept, so killing
+    a brick and counting the remaining ones are O(1).
+    """
+
+    def __init__(self, x, y, cols, rows, brick_width, brick_height, palette, gap=1):
+        self.x = x
+        self.y = y
+        self.cols = cols
+        self.rows = rows
+        self.brick_width = brick_width
+        self.brick_height = brick_height
+        self.pitch_x = brick_width + gap
+        self.pitch_y = brick_height + gap
+        self.palette = palette
+        count = cols * rows
+        self.left = array('h', (x + (i % cols) * self.pitch_x for i in range(count)))
+        self.top = array('h', (y + (i // cols) * self.pitch_y for i in range(count)))
+        self.color = array('B', bytes(count))
+        self.effect = array('B', bytes(count))
+        self.alive = bytearray(b'\x01' * count)
+        self.remaining = count
+
+    def __len__(self):
+        return len(self.alive)
+
+    def kill(self, i):
+        if self.alive[i]:
+            self.alive[i] = 0
+            self.remaining -= 1
+
+    def rect(self, i):
+        return Rect(self.left[i], self.top[i], self.brick_width, self.brick_height)
+
+    def query(self, rect):
+        """Return indices of alive bricks whose cells overlap rect, row by row"""
+        col0 = max((rect.left - self.x) // self.pitch_x, 0)
+        col1 = min((rect.right - 1 - self.x) // self.pitch_x, self.cols - 1)
+        row0 = max((rect.top - self.y) // self.pitch_y, 0)
+        row1 = min((rect.bottom - 1 - self.y) // self.pitch_y, self.rows - 1)
+        alive = self.alive
+        found = []
+        for row in range(row0, row1 + 1):
+            start = row * self.cols
+            for i in range(start + col0, start + col1 + 1):
+                if alive[i]:
+                    found.append(i)
+        return found
+
+    def draw(self, surface, indices=None):
+        """Draw alive bricks, only those in indices if given"""
+        w = self.brick_width
+        h = self.brick_height
+        if indices is None:
+            indices = range(len(self.alive))
+        for i in indices:
+            if self.alive[i]:
+                cached_aa_round_rect(surface, (self.left[i], self.top[i], w, h), self.palette[self.color[i]], rad=7)
 
 
 class Button(GameObject):
@@ -98,7 +157,7 @@ class Button(GameObject):
                     pressed=c.button_pressed_back_color)[self.state]
 
     def draw(self, surface):
-        aa_round_rect(surface, self.bounds, self.back_color, rad=5)
+        cached_aa_round_rect(surface, self.bounds, self.back_color, rad=5)
         self.text.draw(surface)
 
     def handle_mouse_event(self, type, pos):
@@ -131,25 +190,57 @@ class TextObject:
         self.pos = (x, y)
         self.text_func = text_func
         self.color = color
-        self.font = pygame.font.SysFont(font_name, font_size)
-        self.bounds = self.get_surface(text_func())
+        self.font = assets.font(font_name, font_size)
+        self.rendered = None
+        self.bounds = self.get_surface(text_func())[1].move(self.pos)
 
     def draw(self, surface, centralized=False):
-        text_surface, self.bounds = self.get_surface(self.text_func())
+        text_surface, bounds = self.get_surface(self.text_func())
         if centralized:
-            pos = (self.pos[0] - self.bounds.width // 2, self.pos[1])
+            pos = (self.pos[0] - bounds.width // 2, self.pos[1])
         else:
             pos = self.pos
+        self.bounds = bounds.move(pos)
         surface.blit(text_surface, pos)
 
     def get_surface(self, text):
-        text_surface = self.font.render(text, False, self.color)
-        return text_surface, text_surface.get_rect()
+        """Return the rendered text and its rect, rendering only on change"""
+        key = (text, self.color)
+        if self.rendered is None or self.rendered[0] != key:
+            text_surface = self.font.render(text, False, self.color)
+            self.rendered = key, text_surface, text_surface.get_rect()
+        return self.rendered[1], self.rendered[2]
 
     def update(self):
         pass
 
 
+class Message(TextObject):
+    """Text shown over the game for a number of ticks
+
+    The owner counts the ticks down with tick(), update() leaves them alone
+    so the message also expires while other objects are frozen.
+    """
+
+    def __init__(self, x, y, text, color, font_name, font_size, ticks, centralized=False, on_expire=None):
+        TextObject.__init__(self, x, y, lambda: text, color, font_name, font_size)
+        self.ticks = ticks
+        self.centralized = centralized
+        self.on_expire = on_expire
+        if centralized:
+            self.bounds.x -= self.bounds.width // 2
+
+    @property
+    def expired(self):
+        return self.ticks <= 0
+
+    def draw(self, surface):
+        TextObject.draw(self, surface, self.centralized)
+
+    def tick(self):
+        self.ticks -= 1
+
+
 class Paddle(GameObject):
     def __init__(self, x, y, w, h, color, offset):
         GameObject.__init__(self, x, y*1.25, w, h)
@@ -159,7 +250,16 @@ class Paddle(GameObject):
         self.moving_right = False
 
     def draw(self, surface):
-        aa_round_rect(surface, self.bounds, self.color, rad=10)
+        cached_aa_round_rect(surface, self.bounds, self.color, rad=10)
+
+    @property
+    def action(self):
+        """Current input as an env action: 0 left, 1 right, 2 hold"""
+        if self.moving_left:
+            return 0
+        if self.moving_right:
+            return 1
+        return 2
 
     def handle(self, key):
         if key == pygame.K_LEFT:
@@ -167,11 +267,11 @@ class Paddle(GameObject):
         else:
             self.moving_right = not self.moving_right
 
-    def update(self):
+    def update(self, ticks=1):
         if self.moving_left:
-            dx = -(min(self.offset, self.left))
+            dx = -(min(self.offset * ticks, self.left))
         elif self.moving_right:
-            dx = min(self.offset, c.screen_width - self.right)
+            dx = min(self.offset * ticks, c.screen_width - self.right)
         else:
             return
 
@@ -0,0 +1,135 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+OBSERVATION_SIZE = 5
+
+
+def _buffers(buf, n):
+    """Map actions, observations, rewards and dones for n envs onto buf"""
+    actions = np.ndarray((n,), dtype=np.int8, buffer=buf, offset=0)
+    offset = actions.nbytes
+    observations = np.ndarray((n, OBSERVATION_SIZE), dtype=np.float32, buffer=buf, offset=offset)
+    offset += observations.nbytes
+    rewards = np.ndarray((n,), dtype=np.float32, buffer=buf, offset=offset)
+    offset += rewards.nbytes
+    dones = np.ndarray((n,), dtype=np.bool_, buffer=buf, offset=offset)
+    return actions, observations, rewards, dones
+
+
+def _buffers_size(n):
+    return n * (1 + OBSERVATION_SIZE * 4 + 4 + 1)
+
+
+def _write_observation(observations, i, observation):
+    paddle_x, ball_x, ball_y, (speed_x, speed_y) = observation
+    observations[i] = paddle_x, ball_x, ball_y, speed_x, speed_y
+
+
+def _worker(conn, shm_name, n, start, stop, action_repeat):
+    from breakout import BreakoutEnv
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    actions, observations, rewards, dones = _buffers(shm.buf, n)
+    envs = [BreakoutEnv(action_repeat=action_repeat) for _ in range(start, stop)]
+    try:
+        while True:
+            command = conn.recv()
+            if command == 'step':
+                for i, env in enumerate(envs, start):
+                    observation, reward, done = env.step(int(actions[i]))
+                    if done:
+                        observation = env.reset()
+                    _write_observation(observations, i, observation)
+                    rewards[i] = reward
+                    dones[i] = done
+            elif command == 'reset':
+                for i, env in enumerate(envs, start):
+                    _write_observation(observations, i, env.reset())
+                    rewards[i] = 0
+                    dones[i] = False
+            elif command == 'close':
+                break
+            conn.send(None)
+    finally:
+        del actions, observations, rewards, dones
+        shm.close()
+        conn.close()
+
+
+class ParallelBreakoutEnv:
+    """Runs headless BreakoutEnvs in worker processes
+
+    Every worker owns envs_per_worker environments. Actions and observations
+    are exchanged through one shared memory block, the pipes to the workers
+    only carry short commands. Observations are rows of paddle center x,
+    ball x, ball bottom y and ball speed, as returned by BreakoutEnv.observe.
+    Finished episodes are reset automatically by step(). With action_repeat
+    every step applies the actions for up to that many ticks, see
+    BreakoutEnv.
+    """
+
+    def __init__(self, workers, envs_per_worker=1, context=None, action_repeat=1):
+        # Fail here rather than in the worker processes
+        if action_repeat < 1:
+            raise ValueError('action_repeat must be at least 1')
+        ctx = mp.get_context(context)
+        self.n = workers * envs_per_worker
+        self.shm = shared_memory.SharedMemory(create=True, size=_buffers_size(self.n))
+        self.actions, self.observations, self.rewards, self.dones = _buffers(self.shm.buf, self.n)
+        self.pipes = []
+        self.processes = []
+        for w in range(workers):
+            parent, child = ctx.Pipe()
+            start = w * envs_per_worker
+            process = ctx.Process(target=_worker,
+                                  args=(child, self.shm.name, self.n, start, start + envs_per_worker, action_repeat),
+                                  daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def _broadcast(self, command):
+        for pipe in self.pipes:
+            pipe.send(command)
+        for pipe in self.pipes:
+            pipe.recv()
+
+    def reset(self):
+        """Reset all envs and return their observations"""
+        self._broadcast('reset')
+        return self.observations
+
+    def step(self, actions):
+        """Step all envs at once and return (observations, rewards, dones)
+
+        The returned arrays are views on shared memory that are overwritten
+        by the next call.
+        """
+        self.actions[:] = actions
+        self._broadcast('step')
+        return self.observations, self.rewards, self.dones
+
+    def close(self):
+        if not self.processes:
+            return
+        for pipe in self.pipes:
+            pipe.send('close')
+        for process in self.processes:
+            process.join()
+        for pipe in self.pipes:
+            pipe.close()
+        self.processes = []
+        self.pipes = []
+        del self.actions, self.observations, self.rewards, self.dones
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,158 @@
+"""
+Pixel observations of Breakout simulations without per-step allocations.
+
+FrameRenderer draws a simulation into a surface that lives on top of a NumPy
+array, so the last frame can be read without copying it. PixelObserver turns
+32 bit frames into observations, optionally downsampled to grayscale and
+stacked, writing into arrays allocated once. Observations are (height,
+width, 3) RGB or, downsampled, (height, width) grayscale, both uint8.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pygame
+
+import config as c
+from assets import assets
+
+
+def channel_offsets(surface):
+    """Return the byte offsets of red, green and blue in a 32 bit pixel of surface"""
+    offsets = [shift // 8 for shift in surface.get_shifts()[:3]]
+    if sys.byteorder == 'big':
+        offsets = [3 - offset for offset in offsets]
+    return tuple(offsets)
+
+
+def surface_pixels(surface):
+    """Return the pixels of a 32 bit surface as a flat uint32 array
+
+    Rows are get_pitch() bytes apart. The surface stays locked while the
+    array exists.
+    """
+    return np.frombuffer(surface.get_buffer(), dtype=np.uint32)
+
+
+class FrameRenderer:
+    """Draws a Simulation into a NumPy backed surface
+
+    Unlike views from pygame.surfarray.pixels3d the array does not lock the
+    surface, so views of it stay valid across frames. The pixel format
+    matches the display, which keeps blits on the fast path.
+    """
+
+    def __init__(self, width=c.screen_width, height=c.screen_height):
+        if pygame.display.get_surface() is None:
+            # Converting images and baking round rects need a display mode
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            pygame.display.init()
+            pygame.display.set_mode((1, 1))
+        self.width = width
+        self.height = height
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        bgr = pygame.display.get_surface().get_masks()[0] == 0xff0000
+        self.surface = pygame.image.frombuffer(self.buffer, (width, height), 'BGRA' if bgr else 'RGBA')
+        self.channels = channel_offsets(self.surface)
+        self.pixels = self.buffer.view(np.uint32).reshape(-1)
+        self.rgb = self.buffer[:, :, 2::-1] if bgr else self.buffer[:, :, :3]
+        self.background_image = assets.image(c.background_image)
+
+    def render(self, sim):
+        """Draw sim into the buffer"""
+        self.surface.blit(self.background_image, (0, 0))
+        sim.bricks.draw(self.surface)
+        sim.paddle.draw(self.surface)
+        sim.ball.draw(self.surface)
+
+
+class PixelObserver:
+    """Turns 32 bit frames into observations
+
+    Frames are flat uint32 arrays with rows pitch pixels apart and red,
+    green and blue at the byte offsets in channels. With size (width,
+    height) frames are downsampled by nearest neighbour sampling and
+    converted to grayscale. With stack > 1 the last stack frames are
+    returned as one (stack, ...) array, oldest first. The stack is a ring
+    buffer that stores every frame twice, so the frames in order are always
+    a contiguous slice of it. A frame passed to hold() is max-pooled with
+    the next observed frame, which keeps objects that flicker between
+    frames visible. Returned observations are views that are overwritten
+    by later calls.
+    """
+
+    def __init__(self, width, height, size=None, stack=1, pitch=None, channels=(0, 1, 2)):
+        self.width = width
+        self.height = height
+        self.pitch = width if pitch is None else pitch
+        self.channels = channels
+        self.size = size
+        self.stack = stack
+        if size is None:
+            shape = (height, width, 3)
+        else:
+            w, h = size
+            shape = (h, w)
+            rows = np.arange(h) * height // h
+            cols = np.arange(w) * width // w
+            self.samples = (rows[:, None] * self.pitch + cols).astype(np.intp)
+            self.sampled = np.empty((h, w), dtype=np.uint32)
+            self.gray = np.empty((h, w), dtype=np.uint16)
+            self.product = np.empty((h, w), dtype=np.uint16)
+        self.frames = np.zeros((2 * stack,) + shape, dtype=np.uint8)
+        self.index = 0
+        self.held = np.zeros(shape, dtype=np.uint8)
+        self.holding = False
+
+    def convert(self, pixels, out):
+        """Write the observation frame of pixels into out"""
+        if self.size is None:
+            data = pixels.view(np.uint8).reshape(self.height, self.pitch, 4)
+            for i, channel in enumerate(self.channels):
+                np.copyto(out[:, :, i], data[:, :self.width, channel])
+            return
+        np.take(pixels, self.samples, out=self.sampled)
+        data = self.sampled.view(np.uint8).reshape(self.sampled.shape + (4,))
+        # Integer luma, 77/256 red, 150/256 green and 29/256 blue
+        gray = self.gray
+        product = self.product
+        red, green, blue = self.channels
+        np.multiply(data[:, :, red], 77, out=gray, dtype=np.uint16)
+        np.multiply(data[:, :, green], 150, out=product, dtype=np.uint16)
+        gray += product
+        np.multiply(data[:, :, blue], 29, out=product, dtype=np.uint16)
+        gray += product
+        gray >>= 8
+        np.copyto(out, gray, casting='unsafe')
+
+    def hold(self, pixels):
+        """Keep pixels to max-pool with the next observed frame"""
+        self.convert(pixels, self.held)
+        self.holding = True
+
+    def reset(self, pixels):
+        """Start a new episode, filling the stack with pixels"""
+        self.index = 0
+        self.holding = False
+        self.convert(pixels, self.frames[0])
+        self.frames[1:] = self.frames[0]
+        return self.observation()
+
+    def observe(self, pixels):
+        """Push pixels and return the observation"""
+        i = self.index
+        frames = self.frames
+        self.convert(pixels, frames[i])
+        if self.holding:
+            np.maximum(frames[i], self.held, out=frames[i])
+            self.holding = False
+        if self.stack > 1:
+            frames[i + self.stack] = frames[i]
+        self.index = (i + 1) % self.stack
+        return self.observation()
+
+    def observation(self):
+        if self.stack == 1:
+            return self.frames[0]
+        return self.frames[self.index:self.index + self.stack]
@@ -0,0 +1,127 @@
+import csv
+import time
+from collections import deque
+
+import pygame
+from pygame.rect import Rect
+
+import config as c
+from assets import assets
+
+
+class FrameProfiler:
+    """Times the phases of every frame and keeps rolling statistics
+
+    Sequential phases of the game loop are measured with lap(), which
+    attributes the time since the previous lap to the phase. Nested phases,
+    such as collisions inside the update phase, are added with add(). The
+    last window frames are kept for percentiles and, when csv_path is
+    given, every frame is appended to a CSV file. Laps outside of
+    begin_frame() and end_frame() are ignored.
+    """
+
+    def __init__(self, phases, window=300, csv_path=None):
+        self.phases = tuple(phases)
+        self.samples = {phase: deque(maxlen=window) for phase in self.phases}
+        self.frame_times = deque(maxlen=window)
+        self.frame = dict.fromkeys(self.phases, 0.0)
+        self.frame_start = None
+        self.last = None
+        self.frames = 0
+        self.csv_file = None
+        self.writer = None
+        if csv_path is not None:
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.writer = csv.writer(self.csv_file)
+            self.writer.writerow(('frame', 'total') + self.phases)
+
+    def begin_frame(self):
+        self.frame = dict.fromkeys(self.phases, 0.0)
+        self.frame_start = self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if self.frame_start is None:
+            return
+        now = time.perf_counter()
+        self.frame[phase] += now - self.last
+        self.last = now
+
+    def add(self, phase, seconds):
+        self.frame[phase] += seconds
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        total = time.perf_counter() - self.frame_start
+        self.frame_times.append(total)
+        frame = self.frame
+        for phase in self.phases:
+            self.samples[phase].append(frame[phase])
+        if self.writer is not None:
+            self.writer.writerow([self.frames, total] + [frame[phase] for phase in self.phases])
+        self.frames += 1
+        self.frame_start = self.last = None
+
+    def percentile(self, p, phase=None):
+        """Return the p-th percentile in seconds of a phase or of whole frames"""
+        samples = sorted(self.frame_times if phase is None else self.samples[phase])
+        if not samples:
+            return 0.0
+        return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+    def fps(self):
+        if not self.frame_times:
+            return 0.0
+        return len(self.frame_times) / sum(self.frame_times)
+
+    def summary(self):
+        """Return p50, p95 and p99 in milliseconds for frames and every phase"""
+        summary = {}
+        for phase in (None,) + self.phases:
+            summary[phase or 'frame'] = {f'p{p}': self.percentile(p, phase) * 1000 for p in (50, 95, 99)}
+        return summary
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.writer = None
+
+
+class PerformanceHud:
+    """Overlay with FPS, frame time percentiles and a frame time graph"""
+
+    def __init__(self, profiler, x, y, w=170, h=70, frame_rate=c.frame_rate):
+        self.profiler = profiler
+        self.bounds = Rect(x, y, w, h)
+        self.budget = 1 / frame_rate if frame_rate else 1 / 60
+        self.font = None
+
+    def update(self):
+        pass
+
+    def draw(self, surface):
+        if self.font is None:
+            self.font = assets.font(c.font_name, 14)
+        profiler = self.profiler
+        bounds = self.bounds
+        surface.fill((0, 0, 0), bounds)
+
+        # Frame time graph, the budget line sits at half height
+        graph_top = bounds.top + 30
+        graph_h = bounds.bottom - graph_top - 2
+        scale = graph_h / (2 * self.budget)
+        budget_y = bounds.bottom - 2 - int(self.budget * scale)
+        pygame.draw.line(surface, (90, 90, 90), (bounds.left, budget_y), (bounds.right - 1, budget_y))
+        times = list(profiler.frame_times)[-bounds.width:]
+        if len(times) > 1:
+            points = [(bounds.left + i, bounds.bottom - 2 - int(min(t * scale, graph_h)))
+                      for i, t in enumerate(times)]
+            pygame.draw.lines(surface, (0, 255, 0), False, points)
+
+        text = f'FPS {profiler.fps():.0f}  p50 {profiler.percentile(50) * 1000:.1f}' \
+               f'  p95 {profiler.percentile(95) * 1000:.1f} ms'
+        surface.blit(self.font.render(text, False, (255, 255, 255)), (bounds.left + 2, bounds.top + 2))
+        worst = max(profiler.phases, key=lambda phase: profiler.percentile(95, phase))
+        text = f'slowest: {worst} {profiler.percentile(95, worst) * 1000:.1f} ms'
+        surface.blit(self.font.render(text, False, (255, 255, 0)), (bounds.left + 2, bounds.top + 15))
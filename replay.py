@@ -0,0 +1,156 @@
+"""
+Compact binary replays of Breakout simulations.
+
+A replay is a header with the simulation seed, a hash of the config values
+the rules depend on, the complexity and the collision mode, followed by the
+action of every tick run-length encoded as (action byte, varint count) pairs.
+"""
+
+import hashlib
+import struct
+
+import config as c
+from simulation import Simulation
+
+
+MAGIC = b'BRKR'
+VERSION = 3
+HEADER = struct.Struct('<4sBQ8sBB')
+NO_COMPLEXITY = 255
+
+CONFIG_KEYS = ('screen_width', 'screen_height', 'frame_rate', 'row_count', 'brick_width', 'brick_height',
+               'offset_y', 'ball_speed', 'ball_radius', 'paddle_width', 'paddle_height', 'paddle_speed',
+               'initial_lives', 'effect_duration', 'pause_ball', 'max_bounces')
+
+
+def config_hash():
+    """Return 8 bytes identifying the config values that affect the rules"""
+    values = repr([getattr(c, key) for key in CONFIG_KEYS]).encode()
+    return hashlib.sha1(values).digest()[:8]
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recorder:
+    """Records the action of every tick of a simulation
+
+    Attach it with ``sim.recorder = Recorder(sim)`` before the first update.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.runs = []
+
+    def record(self, action, ticks=1):
+        if self.runs and self.runs[-1][0] == action:
+            self.runs[-1][1] += ticks
+        else:
+            self.runs.append([action, ticks])
+
+    def replay(self):
+        sim = self.sim
+        return Replay(sim.seed, sim.complexity, sim.swept, [tuple(run) for run in self.runs])
+
+    def to_bytes(self):
+        return self.replay().to_bytes()
+
+    def save(self, filename):
+        self.replay().save(filename)
+
+
+class Replay:
+    def __init__(self, seed, complexity, swept, runs, config_digest=None):
+        self.seed = seed
+        self.complexity = complexity
+        self.swept = swept
+        self.runs = runs
+        self.config_digest = config_hash() if config_digest is None else config_digest
+
+    @property
+    def ticks(self):
+        return sum(count for _, count in self.runs)
+
+    def actions(self):
+        """Yield the action of every tick"""
+        for action, count in self.runs:
+            for _ in range(count):
+                yield action
+
+    def to_bytes(self):
+        complexity = NO_COMPLEXITY if self.complexity is None else self.complexity
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.config_digest, complexity, self.swept))
+        for action, count in self.runs:
+            out.append(action)
+            _write_varint(out, count)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, digest, complexity, swept = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a Breakout replay')
+        runs = []
+        pos = HEADER.size
+        while pos < len(data):
+            action = data[pos]
+            count, pos = _read_varint(data, pos + 1)
+            runs.append((action, count))
+        return cls(seed, None if complexity == NO_COMPLEXITY else complexity, bool(swept), runs, digest)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def simulation(self):
+        """Return a new simulation in the state the recording started from"""
+        if self.config_digest != config_hash():
+            raise ValueError('Replay was recorded with a different config')
+        sim = Simulation(self.seed, self.swept)
+        if self.complexity is not None:
+            sim.set_complexity(self.complexity)
+        return sim
+
+    def play(self, render=False):
+        """Re-simulate the replay tick by tick and return the simulation
+
+        With render the game is shown in a window at the normal frame rate.
+        """
+        sim = self.simulation()
+        if not render:
+            for action in self.actions():
+                sim.step(action)
+            return sim
+
+        from breakout import Breakout, BreakoutEnv
+
+        breakout = Breakout(sim)
+        breakout.remove_menu()
+        env = BreakoutEnv(breakout)
+        env.reset()
+        for action in self.actions():
+            observation, reward, done = env.step(action)
+            if done:
+                break
+        return sim
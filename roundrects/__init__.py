@@ -1 +1 @@
-from .roundrects import aa_round_rect, round_rect
\ No newline at end of file
+from .roundrects import aa_round_rect, cached_aa_round_rect, round_rect
\ No newline at end of file
@@ -3,6 +3,8 @@
 Rounded rectangles in both non-antialiased and antialiased varieties.
 """
 
+from functools import lru_cache
+
 import pygame as pg
 
 from pygame import gfxdraw
@@ -58,4 +60,39 @@ def _aa_render_region(image, rect, color, rad):
         gfxdraw.aacircle(image, x, y, rad, color)
         gfxdraw.filled_circle(image, x, y, rad, color)
     image.fill(color, rect.inflate(-2*rad,0))
-    image.fill(color, rect.inflate(0,-2*rad))
\ No newline at end of file
+    image.fill(color, rect.inflate(0,-2*rad))
+
+
+@lru_cache(maxsize=256)
+def _baked_aa_round_rect(size, color, rad, border, inside):
+    """Helper function for cached_aa_round_rect."""
+    # Render over black and over white, the difference gives the coverage
+    # of each pixel so edges blend like aa_round_rect drawn in place
+    on_black = pg.Surface(size)
+    on_white = pg.Surface(size)
+    on_white.fill((255, 255, 255))
+    for image in (on_black, on_white):
+        aa_round_rect(image, image.get_rect(), color, rad, border, inside)
+    image = pg.Surface(size, pg.SRCALPHA)
+    for x in range(size[0]):
+        for y in range(size[1]):
+            dark = on_black.get_at((x, y))
+            light = on_white.get_at((x, y))
+            alpha = 255 - (light.r + light.g + light.b - dark.r - dark.g - dark.b) // 3
+            if alpha > 0:
+                image.set_at((x, y), (min(dark.r * 255 // alpha, 255),
+                                      min(dark.g * 255 // alpha, 255),
+                                      min(dark.b * 255 // alpha, 255),
+                                      alpha))
+    return image
+
+
+def cached_aa_round_rect(surface, rect, color, rad=20, border=0, inside=(0,0,0)):
+    """
+    Blit an antialiased rounded rect that is rendered once per combination of
+    size, color, radius and border and kept in a bounded LRU cache.  Usage is
+    identical to aa_round_rect.
+    """
+    rect = pg.Rect(rect)
+    image = _baked_aa_round_rect(rect.size, tuple(color), rad, border, tuple(inside))
+    surface.blit(image, rect)
@@ -0,0 +1,497 @@
+import hashlib
+import math
+import random
+import struct
+import time
+from array import array
+
+from pygame.rect import Rect
+
+import config as c
+from collision import BOTTOM, TOP, hit_side, intersect, sweep
+from effects import INSTANT, REFRESH, EffectScheduler
+from objects import Ball, BrickWall, Paddle
+import colors
+
+
+# Color, start, reset and stacking rule of every special effect
+special_effects = dict(
+    long_paddle=(colors.ORANGE,
+                 lambda g: g.paddle.bounds.inflate_ip(c.paddle_width // 2, 0),
+                 lambda g: g.paddle.bounds.inflate_ip(-c.paddle_width // 2, 0),
+                 REFRESH),
+    slow_ball=(colors.AQUAMARINE2,
+               lambda g: g.change_ball_speed(-1),
+               lambda g: g.change_ball_speed(1),
+               REFRESH),
+    tripple_points=(colors.DARKSEAGREEN4,
+                    lambda g: g.set_points_per_brick(3),
+                    lambda g: g.set_points_per_brick(1),
+                    REFRESH),
+    extra_life=(colors.GOLD1,
+                lambda g: g.add_life(),
+                lambda g: None,
+                INSTANT))
+
+# Effect ids stored in BrickWall.effect index this table, 0 means no effect
+effect_table = list(special_effects.values())
+effect_palette = [color for color, _, _, _ in effect_table]
+
+# Snapshot layout, see Simulation.clone_state()
+STATE = struct.Struct('<QqiidbI?ddddhhBBBhhhh??dIB?d')
+EFFECT_STATE = struct.Struct('<QIB')
+MAX_EFFECTS = 16
+RNG_WORDS = 625
+
+
+class Simulation:
+    """Breakout rules without a window, audio or frame cap
+
+    The simulation only moves objects and resolves collisions. Sounds that
+    should be played for the last update are collected in ``sounds`` so a
+    renderer can play them. All randomness comes from a generator seeded
+    with ``seed`` and special effects are scheduled in ticks, so a seed and
+    the actions of every tick reproduce a game exactly.
+
+    With swept collisions the ball is moved along its whole displacement
+    and bounces in order of time of impact, so it cannot tunnel at high
+    speeds or large timesteps.
+    """
+
+    def __init__(self, seed=None, swept=None):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.swept = c.swept_collisions if swept is None else swept
+        self.complexity = None
+        self.ticks = 0
+        self.recorder = None
+        self.profiler = None
+        # Bytes of the generator state, cleared whenever a number is drawn
+        self.random_state = None
+        self.effects = EffectScheduler(effect_table, c.effect_duration * c.frame_rate)
+        self.score = 0
+        self.lives = c.initial_lives
+        self.points_per_brick = 1
+        self.ball_speed = c.ball_speed
+        self.game_over = False
+        self.paddle = None
+        self.bricks = None
+        self.ball = None
+        self.pause = None
+        self.sounds = []
+        self.create_objects()
+
+    @property
+    def won(self):
+        return not self.bricks.remaining
+
+    def add_life(self):
+        self.lives += 1
+
+    def set_points_per_brick(self, points):
+        self.points_per_brick = points
+
+    def change_ball_speed(self, dy):
+        self.ball.speed = (self.ball.speed[0], self.ball.speed[1] + dy)
+
+    def change_paddle_speed(self, dy):
+        self.paddle.offset = dy
+
+    def set_complexity(self, complexity):
+        """Scale ball and paddle speed for complexity in range [0; 10]"""
+        self.complexity = complexity
+        k_comp = complexity * 0.1 + 1
+        self.ball_speed = k_comp * c.ball_speed
+        self.ball.speed = self.ball.speed[0], self.ball_speed
+        self.paddle.speed = (2 - k_comp) * c.paddle_speed
+
+    def create_objects(self):
+        self.create_bricks()
+        self.create_paddle()
+        self.create_ball()
+
+    def create_ball(self):
+        self.random_state = None
+        speed = (self.random.randint(-2, 2), self.ball_speed)
+        self.ball = Ball(c.screen_width // 2,
+                         c.screen_height // 2,
+                         c.ball_radius,
+                         c.ball_color,
+                         speed)
+        self.pause = c.pause_ball * c.frame_rate
+
+    def create_paddle(self):
+        self.paddle = Paddle((c.screen_width - c.paddle_width) // 2,
+                             c.screen_height - c.paddle_height * 2,
+                             c.paddle_width,
+                             c.paddle_height,
+                             c.paddle_color,
+                             c.paddle_speed)
+
+    def create_bricks(self):
+        w = c.brick_width
+        h = c.brick_height
+        brick_count = c.screen_width // (w + 1)
+        offset_x = (c.screen_width - brick_count * (w + 1)) // 2
+
+        palette = [c.brick_color] + effect_palette
+        bricks = BrickWall(offset_x, c.offset_y, brick_count, c.row_count, w, h, palette)
+        for i in range(len(bricks)):
+            index = self.random.randint(0, 10)
+            if index < len(effect_table):
+                bricks.color[i] = bricks.effect[i] = index + 1
+        self.bricks = bricks
+
+    def handle_ball_collisions(self):
+        self.ball.color = colors.SKYBLUE
+
+        flag = False
+
+        # Hit paddle
+        s = self.ball.speed
+        ball = self.ball.bounds
+        edge = intersect(self.paddle.bounds, ball)
+        if edge is not None:
+            self.sounds.append('paddle_hit')
+            self.ball.color = colors.RED4
+        if edge == 'top':
+            speed_x = s[0]
+            speed_y = -s[1]
+            if self.paddle.moving_left:
+                speed_x -= 1
+            elif self.paddle.moving_right:
+                speed_x += 1
+            self.ball.speed = speed_x, speed_y
+        elif edge in ('left', 'right'):
+            self.ball.speed = (-s[0], s[1])
+
+        # Hit ceiling
+        if self.ball.top <= 0:
+            self.sounds.append('wall_hit')
+            self.ball.color = colors.RED1
+            flag = True
+            self.ball.speed = (s[0], -s[1])
+
+        # Hit floor
+        if self.ball.top >= c.screen_height:
+            flag = True
+            self.lose_ball()
+
+        # Hit wall
+        if (self.ball.left <= 0 or self.ball.right >= c.screen_width) and not flag:
+            self.ball.color = colors.RED1
+            self.sounds.append('wall_hit')
+            self.ball.speed = (-s[0], s[1])
+
+        # Hit brick, edges of touching bricks lie within one pixel of the ball
+        ball = self.ball.bounds
+        bricks = self.bricks
+        w = bricks.brick_width
+        h = bricks.brick_height
+        hits = []
+        flip_y = False
+        for i in bricks.query(ball.inflate(2, 2)):
+            left = bricks.left[i]
+            top = bricks.top[i]
+            edge = hit_side(left, top, left + w, top + h, ball)
+            if edge:
+                hits.append(i)
+                flip_y = flip_y or edge in ('top', 'bottom')
+
+        # Bounce once for all hit bricks before their effects change the speed
+        if hits:
+            self.ball.speed = (s[0], -s[1]) if flip_y else (-s[0], s[1])
+            for i in hits:
+                self.hit_brick(i)
+
+    def hit_brick(self, i):
+        """Destroy brick i, score it and trigger its special effect"""
+        bricks = self.bricks
+        self.sounds.append('brick_hit')
+        bricks.kill(i)
+        self.ball.color = colors.RED1
+        self.score += self.points_per_brick
+
+        effect = bricks.effect[i]
+        if effect:
+            self.effects.trigger(effect, self, self.ticks)
+
+    def lose_ball(self):
+        self.lives -= 1
+        if self.lives == 0:
+            self.game_over = True
+        else:
+            self.create_ball()
+
+    def next_impact(self, x, y, vx, vy, ticks):
+        """Return the first impact of the ball moving from (x, y) within ticks
+
+        The impact is a (time, kind, side, brick index) tuple where kind is
+        'wall', 'ceiling', 'floor', 'paddle' or 'brick', or None.
+        """
+        d = self.ball.diameter
+        paddle = self.paddle.bounds
+        bricks = self.bricks
+        w = bricks.brick_width
+        h = bricks.brick_height
+        end_x = x + vx * ticks
+        end_y = y + vy * ticks
+
+        first = None
+        if vx < 0:
+            first = (max(-x / vx, 0), 'wall', None, None)
+        elif vx > 0:
+            first = (max((c.screen_width - d - x) / vx, 0), 'wall', None, None)
+        if vy < 0:
+            t = max(-y / vy, 0)
+            if first is None or t < first[0]:
+                first = (t, 'ceiling', None, None)
+        elif vy > 0:
+            t = max((c.screen_height - y) / vy, 0)
+            if first is None or t < first[0]:
+                first = (t, 'floor', None, None)
+
+        hit = sweep(x, y, vx, vy, paddle.left - d, paddle.top - d, paddle.right, paddle.bottom)
+        if hit is not None and (first is None or hit[0] < first[0]):
+            first = (hit[0], 'paddle', hit[1], None)
+
+        # Round outwards, Rect truncates position and size separately
+        left = math.floor(min(x, end_x)) - 1
+        top = math.floor(min(y, end_y)) - 1
+        swept = Rect(left, top, math.ceil(max(x, end_x) + d) + 1 - left, math.ceil(max(y, end_y) + d) + 1 - top)
+        for i in bricks.query(swept):
+            left = bricks.left[i]
+            top = bricks.top[i]
+            hit = sweep(x, y, vx, vy, left - d, top - d, left + w, top + h)
+            if hit is not None and (first is None or hit[0] < first[0]):
+                first = (hit[0], 'brick', hit[1], i)
+        return first
+
+    def move_ball_swept(self, ticks):
+        """Move the ball over ticks, bouncing in order of time of impact"""
+        ball = self.ball
+        ball.color = colors.SKYBLUE
+        x, y = ball.pos
+        remaining = ticks
+        for _ in range(c.max_bounces):
+            vx, vy = ball.speed
+            first = self.next_impact(x, y, vx, vy, remaining)
+            if first is None or first[0] >= remaining:
+                x += vx * remaining
+                y += vy * remaining
+                break
+            t, kind, side, i = first
+            x += vx * t
+            y += vy * t
+            remaining -= t
+            if kind == 'wall':
+                self.sounds.append('wall_hit')
+                ball.color = colors.RED1
+                ball.speed = (-vx, vy)
+            elif kind == 'ceiling':
+                self.sounds.append('wall_hit')
+                ball.color = colors.RED1
+                ball.speed = (vx, -vy)
+            elif kind == 'floor':
+                self.lose_ball()
+                return
+            elif kind == 'paddle':
+                self.sounds.append('paddle_hit')
+                ball.color = colors.RED4
+                if side == TOP:
+                    if self.paddle.moving_left:
+                        vx -= 1
+                    elif self.paddle.moving_right:
+                        vx += 1
+                    ball.speed = (vx, -vy)
+                elif side == BOTTOM:
+                    ball.speed = (vx, -vy)
+                else:
+                    ball.speed = (-vx, vy)
+            else:
+                if side in (TOP, BOTTOM):
+                    ball.speed = (vx, -vy)
+                else:
+                    ball.speed = (-vx, vy)
+                self.hit_brick(i)
+
+        ball.pos = (x, y)
+        ball.bounds.topleft = (int(x), int(y))
+
+    def state_size(self):
+        """Return the size in bytes of clone_state() snapshots"""
+        return STATE.size + MAX_EFFECTS * EFFECT_STATE.size + 2 * len(self.bricks) + RNG_WORDS * 4
+
+    def clone_state(self, out=None):
+        """Return the game state as a fixed size snapshot
+
+        The snapshot holds ticks, score, lives, ball, paddle, bricks, running
+        effects and the random generator state, written into the bytearray
+        out if given. Sounds, the recorder and the no-op paddle speed are
+        not included.
+        """
+        if out is None:
+            out = bytearray(self.state_size())
+        ball = self.ball
+        paddle = self.paddle
+        bounds = paddle.bounds
+        entries = self.effects.entries()
+        if len(entries) > MAX_EFFECTS:
+            raise ValueError(f'Only {MAX_EFFECTS} running effects fit into a snapshot')
+        if self.random_state is None:
+            _, words, gauss_next = self.random.getstate()
+            self.random_state = gauss_next, array('I', words).tobytes()
+        gauss_next, words = self.random_state
+        STATE.pack_into(out, 0, self.ticks, self.score, self.lives, self.points_per_brick, self.ball_speed,
+                        -1 if self.complexity is None else self.complexity, self.pause, self.game_over,
+                        ball.pos[0], ball.pos[1], ball.speed[0], ball.speed[1], ball.bounds.x, ball.bounds.y,
+                        *ball.color, bounds.x, bounds.y, bounds.w, bounds.h, paddle.moving_left,
+                        paddle.moving_right, paddle.offset, self.effects.serial, len(entries),
+                        gauss_next is not None, gauss_next or 0.0)
+        offset = STATE.size
+        for entry in entries:
+            EFFECT_STATE.pack_into(out, offset, *entry)
+            offset += EFFECT_STATE.size
+        offset = STATE.size + MAX_EFFECTS * EFFECT_STATE.size
+        n = len(self.bricks)
+        out[offset:offset + n] = self.bricks.alive
+        out[offset + n:offset + 2 * n] = self.bricks.effect
+        offset += 2 * n
+        out[offset:] = words
+        return out
+
+    def restore_state(self, state):
+        """Restore a snapshot made by clone_state()
+
+        The simulation must use the same config and collision mode as the
+        one that was cloned.
+        """
+        (self.ticks, self.score, self.lives, self.points_per_brick, self.ball_speed, complexity, self.pause,
+         self.game_over, x, y, vx, vy, ball_x, ball_y, red, green, blue, paddle_x, paddle_y, paddle_w, paddle_h,
+         moving_left, moving_right, offset, serial, count, has_gauss, gauss_next) = STATE.unpack_from(state)
+        self.complexity = None if complexity < 0 else complexity
+        ball = self.ball
+        ball.pos = (x, y)
+        ball.speed = (int(vx) if vx.is_integer() else vx, int(vy) if vy.is_integer() else vy)
+        ball.bounds.topleft = (ball_x, ball_y)
+        ball.color = (red, green, blue)
+        paddle = self.paddle
+        paddle.bounds.update(paddle_x, paddle_y, paddle_w, paddle_h)
+        paddle.moving_left = moving_left
+        paddle.moving_right = moving_right
+        paddle.offset = offset
+        self.effects.load([EFFECT_STATE.unpack_from(state, STATE.size + i * EFFECT_STATE.size)
+                           for i in range(count)], serial)
+        bricks = self.bricks
+        n = len(bricks)
+        offset = STATE.size + MAX_EFFECTS * EFFECT_STATE.size
+        bricks.alive[:] = state[offset:offset + n]
+        bricks.remaining = n - bricks.alive.count(0)
+        bricks.effect = array('B', state[offset + n:offset + 2 * n])
+        bricks.color = array('B', bricks.effect)
+        gauss_next = gauss_next if has_gauss else None
+        words = bytes(state[offset + 2 * n:])
+        if self.random_state != (gauss_next, words):
+            self.random.setstate((3, tuple(array('I', words)), gauss_next))
+            self.random_state = gauss_next, words
+        self.sounds = []
+
+    def state_hash(self, state=None):
+        """Return a 64 bit hash of clone_state() that is stable across processes and runs
+
+        Pass a snapshot already taken of the current state as state to skip
+        cloning it again.
+        """
+        if state is None:
+            state = self.clone_state()
+        return int.from_bytes(hashlib.blake2b(state, digest_size=8).digest(), 'little')
+
+    def set_action(self, action):
+        """Move paddle left (0), right (1) or hold it (anything else)"""
+        self.paddle.moving_left = action == 0
+        self.paddle.moving_right = action == 1
+
+    def update(self, ticks=1):
+        """Advance the simulation by ticks
+
+        Only swept collisions can advance more than one tick per update.
+        """
+        if ticks != 1 and not self.swept:
+            raise ValueError('Only swept collisions support several ticks per update')
+        self.sounds = []
+        if self.game_over:
+            return
+
+        self.ticks += ticks
+        if self.recorder is not None:
+            self.recorder.record(self.paddle.action, ticks)
+
+        if not self.bricks.remaining:
+            self.game_over = True
+            return
+
+        if self.pause:
+            self.pause = max(self.pause - ticks, 0)
+            self.paddle.update(ticks)
+            return
+
+        self.effects.expire(self, self.ticks)
+
+        # Swept movement finds the collisions, so it counts as collisions
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        if self.swept:
+            self.move_ball_swept(ticks)
+        else:
+            self.handle_ball_collisions()
+        if profiler is not None:
+            now = time.perf_counter()
+            profiler.add('collisions', now - start)
+            start = now
+        self.paddle.update(ticks)
+        if not self.swept:
+            self.ball.update()
+        if profiler is not None:
+            profiler.add('movement', time.perf_counter() - start)
+
+    def step(self, action, ticks=1):
+        """Apply action and advance the simulation by ticks"""
+        self.set_action(action)
+        self.update(ticks)
+
+    def fast_forward(self, action, max_ticks):
+        """Apply action and advance up to and including the next ball event
+
+        With swept collisions the ball moves in a straight line between
+        events, so the simulation jumps over the ticks in between. Near the
+        paddle plane, where paddle input matters every tick, and with
+        discrete collisions it falls back to a single tick. Returns the
+        number of ticks advanced.
+        """
+        self.set_action(action)
+        if self.game_over or max_ticks < 1:
+            return 0
+        if not self.swept:
+            self.update()
+            return 1
+        if self.pause:
+            ticks = min(self.pause, max_ticks)
+            self.update(ticks)
+            return ticks
+
+        x, y = self.ball.pos
+        vx, vy = self.ball.speed
+        ticks = max_ticks
+        expiry = self.effects.next_expiry()
+        if expiry is not None:
+            # Stop before the tick that resets the effect
+            ticks = min(ticks, max(expiry - self.ticks - 1, 1))
+        if vy > 0:
+            plane = self.paddle.top - self.ball.diameter
+            ticks = min(ticks, max(math.floor((plane - y) / vy), 1))
+        impact = self.next_impact(x, y, vx, vy, ticks)
+        if impact is not None:
+            ticks = min(ticks, max(math.ceil(impact[0]), 1))
+        self.update(ticks)
+        return ticks
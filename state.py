@@ -0,0 +1,69 @@
+"""
+Fixed layout float32 state vectors of Breakout simulations.
+
+Index              Value
+PADDLE_X           paddle center x
+BALL_X, BALL_Y     ball top left corner
+BALL_VX, BALL_VY   ball speed
+LIVES              lives left
+EFFECTS + id - 1   ticks until special effect id expires, 0 when inactive
+BRICKS + i         1 while brick i is alive, else 0
+
+Effect ids follow simulation.effect_table, instant effects are always 0.
+"""
+
+from array import array
+
+import numpy as np
+
+from simulation import effect_table
+
+PADDLE_X = 0
+BALL_X = 1
+BALL_Y = 2
+BALL_VX = 3
+BALL_VY = 4
+LIVES = 5
+EFFECTS = 6
+BRICKS = EFFECTS + len(effect_table)
+
+NO_EFFECTS = memoryview(array('f', bytes(4 * len(effect_table))))
+
+
+def state_size(sim):
+    return BRICKS + len(sim.bricks)
+
+
+def write_state(sim, out, bricks=True):
+    """Write the state vector of sim into the float32 array out and return it
+
+    Bricks only change when one is destroyed, pass bricks=False to keep
+    the brick flags already in out.
+    """
+    # Item assignment through a memoryview is much cheaper than on the array
+    values = memoryview(out)
+    paddle = sim.paddle.bounds
+    ball = sim.ball
+    values[PADDLE_X] = paddle.x + paddle.w / 2
+    values[BALL_X], values[BALL_Y] = ball.pos
+    values[BALL_VX], values[BALL_VY] = ball.speed
+    values[LIVES] = sim.lives
+    values[EFFECTS:BRICKS] = NO_EFFECTS
+    if sim.effects.heap:
+        for effect, expiry in sim.effects.expiries().items():
+            values[EFFECTS + effect - 1] = expiry - sim.ticks
+    if bricks:
+        out[BRICKS:] = np.frombuffer(sim.bricks.alive, dtype=np.uint8)
+    return out
+
+
+def batch_states(sims, out=None):
+    """Return the state vectors of sims as rows of one 2D float32 array
+
+    Pass the array returned by the previous call as out to reuse it.
+    """
+    if out is None:
+        out = np.empty((len(sims), state_size(sims[0])), dtype=np.float32)
+    for i, sim in enumerate(sims):
+        write_state(sim, out[i])
+    return out
@@ -0,0 +1,238 @@
+import numpy as np
+
+import config as c
+
+
+# Effect ids stored per brick, in the order of simulation.special_effects
+NO_EFFECT = 0
+LONG_PADDLE = 1
+SLOW_BALL = 2
+TRIPPLE_POINTS = 3
+EXTRA_LIFE = 4
+TIMED_EFFECTS = (LONG_PADDLE, SLOW_BALL, TRIPPLE_POINTS)
+
+
+def brick_layout():
+    """Return left, top, width and height arrays of the standard brick wall"""
+    w = c.brick_width
+    h = c.brick_height
+    brick_count = c.screen_width // (w + 1)
+    offset_x = (c.screen_width - brick_count * (w + 1)) // 2
+    rows, cols = np.divmod(np.arange(c.row_count * brick_count), brick_count)
+    left = offset_x + cols * (w + 1)
+    top = c.offset_y + rows * (h + 1)
+    return left, top, np.full_like(left, w), np.full_like(top, h)
+
+
+def edge_hits(bx, by, d, left, top, width, height):
+    """Batched version of the edge test of Simulation.handle_ball_collisions
+
+    Ball boxes (bx, by, d x d) are tested against the 1 pixel edges of the
+    given boxes. Returns two boolean arrays: hits that flip the vertical speed
+    (top or bottom edge) and hits that flip the horizontal speed (left or
+    right edge).
+    """
+    right = left + width
+    bottom = top + height
+    cx = bx + d // 2
+    cy = by + d // 2
+
+    in_x = (bx < right) & (left < bx + d)
+    in_y = (by < bottom) & (top < by + d)
+    hit_left = (bx < left + 1) & (left < bx + d) & in_y
+    hit_right = (bx < right + 1) & (right < bx + d) & in_y
+    hit_top = (by < top + 1) & (top < by + d) & in_x
+    hit_bottom = (by < bottom + 1) & (bottom < by + d) & in_x
+
+    count = (hit_left.astype(np.int8) + hit_right + hit_top + hit_bottom)
+    single = count == 1
+    corner_top = ~single & hit_top
+    corner_bottom = ~single & ~hit_top & hit_bottom
+
+    vertical = (single & (hit_top | hit_bottom)) | \
+               (corner_top & (cy >= top)) | \
+               (corner_bottom & (cy >= bottom))
+    horizontal = (single & (hit_left | hit_right)) | \
+                 ((corner_top | corner_bottom) & ~vertical)
+    return vertical, horizontal
+
+
+class VecBreakoutEnv:
+    """N headless Breakout games stepped at once in NumPy arrays
+
+    Follows the rules of simulation.Simulation, except that effect timers
+    stop while the ball is paused.
+    Actions are 0 (left), 1 (right) or anything else (hold). Finished games
+    are reset automatically by step().
+    """
+
+    def __init__(self, n, complexity=0, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.ball_speed = (complexity * 0.1 + 1) * c.ball_speed
+        self.brick_left, self.brick_top, self.brick_width, self.brick_height = brick_layout()
+        brick_count = len(self.brick_left)
+
+        self.ball_x = np.zeros(n)
+        self.ball_y = np.zeros(n)
+        self.ball_vx = np.zeros(n)
+        self.ball_vy = np.zeros(n)
+        self.paddle_x = np.zeros(n)
+        self.paddle_w = np.zeros(n)
+        self.paddle_y = int((c.screen_height - c.paddle_height * 2) * 1.25)
+        self.alive = np.zeros((n, brick_count), dtype=bool)
+        self.effects = np.zeros((n, brick_count), dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.points_per_brick = np.zeros(n, dtype=np.int64)
+        self.pause = np.zeros(n, dtype=np.int64)
+        # Remaining ticks of every timed effect, column effect id - 1
+        self.effect_ticks = np.zeros((n, len(TIMED_EFFECTS)), dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Start new games where mask is set (all games by default)"""
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        count = int(mask.sum())
+        if not count:
+            return self.observe()
+
+        self.alive[mask] = True
+        index = self.rng.integers(0, 11, size=(count, self.alive.shape[1]))
+        self.effects[mask] = np.where(index < 4, index + 1, NO_EFFECT)
+        self.paddle_x[mask] = (c.screen_width - c.paddle_width) // 2
+        self.paddle_w[mask] = c.paddle_width
+        self.score[mask] = 0
+        self.lives[mask] = c.initial_lives
+        self.points_per_brick[mask] = 1
+        self.effect_ticks[mask] = 0
+        self.done[mask] = False
+        self._create_ball(mask)
+        return self.observe()
+
+    def _create_ball(self, mask):
+        self.ball_x[mask] = c.screen_width // 2 - c.ball_radius
+        self.ball_y[mask] = c.screen_height // 2 - c.ball_radius
+        self.ball_vx[mask] = self.rng.integers(-2, 3, size=int(mask.sum()))
+        self.ball_vy[mask] = self.ball_speed
+        self.pause[mask] = c.pause_ball * c.frame_rate
+
+    def _apply_effect(self, mask, effect, start):
+        sign = 1 if start else -1
+        m = mask & (effect == LONG_PADDLE)
+        # Rect.inflate_ip moves x by half the change, rounded towards zero
+        self.paddle_x[m] -= sign * (c.paddle_width // 2 // 2)
+        self.paddle_w[m] += sign * (c.paddle_width // 2)
+        m = mask & (effect == SLOW_BALL)
+        self.ball_vy[m] -= sign
+        m = mask & (effect == TRIPPLE_POINTS)
+        self.points_per_brick[m] = 3 if start else 1
+
+    def _move_paddle(self, mask, left, right):
+        offset = c.paddle_speed
+        dx = np.where(left, -np.minimum(offset, self.paddle_x),
+                      np.where(right, np.minimum(offset, c.screen_width - (self.paddle_x + self.paddle_w)), 0))
+        self.paddle_x[mask] += dx[mask]
+
+    def step(self, actions):
+        """Advance every game by one tick
+
+        Returns observations, score deltas as rewards and done flags. Games
+        that are done are reset before the observation is taken.
+        """
+        actions = np.asarray(actions)
+        left = actions == 0
+        right = actions == 1
+        d = c.ball_radius * 2
+        score_before = self.score.copy()
+
+        running = ~self.done
+        won = running & ~self.alive.any(axis=1)
+        self.done |= won
+        running &= ~won
+
+        paused = running & (self.pause > 0)
+        self.pause[paused] -= 1
+        self._move_paddle(paused, left, right)
+        active = running & ~paused
+
+        # Reset expired special effects
+        timed = active[:, None] & (self.effect_ticks > 0)
+        self.effect_ticks[timed] -= 1
+        expired = timed & (self.effect_ticks == 0)
+        for effect in TIMED_EFFECTS:
+            self._apply_effect(expired[:, effect - 1], effect, start=False)
+
+        bx, by = self.ball_x, self.ball_y
+        svx, svy = self.ball_vx.copy(), self.ball_vy.copy()
+        vx, vy = svx.copy(), svy.copy()
+
+        # Hit paddle
+        vertical, horizontal = edge_hits(bx, by, d, self.paddle_x, self.paddle_y, self.paddle_w, c.paddle_height)
+        top = active & vertical & (by < self.paddle_y + 1)
+        vx = np.where(top, svx - left + (right & ~left), vx)
+        vy = np.where(top, -svy, vy)
+        side = active & horizontal
+        vx = np.where(side, -svx, vx)
+        vy = np.where(side, svy, vy)
+
+        # Hit ceiling
+        ceiling = active & (by <= 0)
+        vx = np.where(ceiling, svx, vx)
+        vy = np.where(ceiling, -svy, vy)
+
+        # Hit floor
+        floor = active & (by >= c.screen_height)
+        self.lives[floor] -= 1
+        lost = floor & (self.lives == 0)
+        self.done |= lost
+        respawn = floor & ~lost
+
+        # Hit wall
+        wall = active & ~ceiling & ~floor & ((bx <= 0) | (bx + d >= c.screen_width))
+        vx = np.where(wall, -svx, vx)
+        vy = np.where(wall, svy, vy)
+
+        # Hit brick
+        vertical, horizontal = edge_hits(bx[:, None], by[:, None], d,
+                                         self.brick_left, self.brick_top, self.brick_width, self.brick_height)
+        hits = self.alive & (vertical | horizontal) & active[:, None]
+        hit_count = hits.sum(axis=1)
+        hit_any = hit_count > 0
+        self.alive &= ~hits
+        self.score += hit_count * self.points_per_brick
+        flip_y = hit_any & (vertical & hits).any(axis=1)
+        vx = np.where(hit_any, np.where(flip_y, svx, -svx), vx)
+        vy = np.where(hit_any, np.where(flip_y, -svy, svy), vy)
+        self.ball_vx[active] = vx[active]
+        self.ball_vy[active] = vy[active]
+
+        # Trigger special effects of hit bricks, running effects are refreshed
+        effect_hits = np.where(hits, self.effects, NO_EFFECT)
+        for effect in TIMED_EFFECTS:
+            hit = (effect_hits == effect).any(axis=1)
+            self._apply_effect(hit & (self.effect_ticks[:, effect - 1] == 0), effect, start=True)
+            self.effect_ticks[hit, effect - 1] = c.effect_duration * c.frame_rate
+        self.lives += (effect_hits == EXTRA_LIFE).sum(axis=1)
+
+        self._create_ball(respawn)
+        self._move_paddle(active, left, right)
+        self.ball_x[active] += np.trunc(self.ball_vx[active])
+        self.ball_y[active] += np.trunc(self.ball_vy[active])
+
+        rewards = self.score - score_before
+        dones = self.done.copy()
+        self.reset(dones)
+        return self.observe(), rewards, dones
+
+    def observe(self):
+        """Return an (n, 5) array of paddle center x, ball x, ball bottom y and ball speed"""
+        obs = np.empty((self.n, 5), dtype=np.float32)
+        obs[:, 0] = self.paddle_x + c.paddle_width // 2
+        obs[:, 1] = self.ball_x
+        obs[:, 2] = self.ball_y + c.ball_radius
+        obs[:, 3] = self.ball_vx
+        obs[:, 4] = self.ball_vy
+        return obs